@@ -1,4 +1,5 @@
 import bproc
+import bisect
 import copy
 import xml.etree.ElementTree as ET
 
@@ -20,6 +21,9 @@ class Act(object):
         self._pw_prior = bproc.PieceWiseFun([
             (self.created, float('inf'), prior)])
         self._pw_onoff = bproc.PieceWiseFun()
+        # End time of the last session lasting more than 5 minutes.
+        # Updated at each switch, rebuilt by self._pw_actualize call
+        self._last_long_stop = None
 
     def is_on(self):
         return len(self.onoff) % 2 == 1
@@ -79,10 +83,12 @@ class Act(object):
         self.onoff.append(self.dt.curtime_to_int())
         _d = 1 if self.is_on() else None
         self._pw_onoff.add_section(self.onoff[-1], float('inf'), _d)
+        if not self.is_on() and self.onoff[-1] - self.onoff[-2] > 300:
+            self._last_long_stop = self.onoff[-1]
 
     def set_priority(self, p):
         'sets new priority'
-        if self.is_alive():
+        if self.is_alive() and p != self.current_priority():
             self.prior.append((self.dt.curtime_to_int(), p))
             self._pw_prior.add_section(self.prior[-1][0], float('inf'), p)
 
@@ -151,6 +157,19 @@ class Act(object):
         ret._pw_actualize()
         return ret
 
+    def state(self):
+        '->tuple. Copy of mutable task data for self.restore()'
+        return (self.name, self.comment, self.created, self.finished,
+                list(self.prior), list(self.onoff), self.archived_stop)
+
+    def restore(self, st):
+        ' restores data saved by self.state()'
+        (self.name, self.comment, self.created, self.finished,
+         prior, onoff, self.archived_stop) = st
+        self.prior = list(prior)
+        self.onoff = list(onoff)
+        self._pw_actualize()
+
     def last_stop(self):
         """ Returnss ending time of last
             session lasting more than 5 minutes if inactive.
@@ -158,13 +177,8 @@ class Act(object):
         """
         if self.is_on():
             return None
-        for i, tm in enumerate(reversed(self.onoff)):
-            if i % 2 == 0:
-                last_end = tm
-                continue
-            dur = last_end - tm
-            if dur > 300:
-                return last_end
+        if self._last_long_stop is not None:
+            return self._last_long_stop
         return self.archived_stop
 
     def _pw_actualize(self):
@@ -179,6 +193,12 @@ class Act(object):
         self._pw_prior.clear()
         for x in self.prior:
             self._pw_prior.add_section(x[0], float('inf'), x[1])
+        # last long session
+        self._last_long_stop = None
+        for i in range(len(self.onoff) - len(self.onoff) % 2 - 1, 0, -2):
+            if self.onoff[i] - self.onoff[i - 1] > 300:
+                self._last_long_stop = self.onoff[i]
+                break
 
     def _cutonoff(self, tm):
         ionoff = 0
@@ -200,6 +220,33 @@ class Act(object):
             self.prior.insert(ipri, copy.deepcopy(self.prior[ipri - 1]))
         return ipri
 
+    def compact(self):
+        """ ->(int, int). Removes entries which carry no information:
+            zero-length sessions, zero-length pauses between sessions and
+            priority changes which keep the previous value.
+            Returns numbers of removed onoff and prior entries.
+        """
+        onoff = []
+        for t in self.onoff:
+            # equal neighbours bound a zero-length session or pause
+            if onoff and onoff[-1] == t:
+                onoff.pop()
+            else:
+                onoff.append(t)
+        prior = []
+        for x in self.prior:
+            # the later of simultaneous changes wins
+            while prior and prior[-1][0] == x[0]:
+                prior.pop()
+            if not prior or prior[-1][1] != x[1]:
+                prior.append(x)
+        ret = (len(self.onoff) - len(onoff), len(self.prior) - len(prior))
+        if ret != (0, 0):
+            self.onoff = onoff
+            self.prior = prior
+            self._pw_actualize()
+        return ret
+
     def delete_before(self, tm):
         # onoff
         self.onoff = self.onoff[self._cutonoff(tm):]
@@ -229,3 +276,138 @@ class Act(object):
         if self.finished is not None:
             self.finished += delta
         self._pw_actualize()
+
+    # Session editing. Running session is treated as closed at infinity,
+    # so it is kept running after any edit.
+    def _close_running(self):
+        if self.is_on():
+            self.onoff.append(float('inf'))
+            return True
+        return False
+
+    def touches(self, t0=None, t1=None):
+        """ ->bool. Whether task is on at t0 or switches within [t0, t1).
+            None - unbounded. Session edits within [t0, t1)
+            do not change other tasks.
+        """
+        on = self.onoff
+        i = 0 if t0 is None else bisect.bisect_left(on, t0)
+        return i % 2 == 1 or \
+            (i < len(on) and (t1 is None or on[i] < t1))
+
+    def cut_sessions(self, t0, t1):
+        """ ->[(on, off)]. Removes activity within [t0, t1) splitting
+            sessions at interval ends. Returns removed pieces.
+        """
+        if t0 >= t1:
+            return []
+        running = self._close_running()
+        on = self.onoff
+        # first time after t0 and first time not before t1.
+        # Odd index means a session crosses the interval end
+        i0 = bisect.bisect_right(on, t0)
+        i1 = bisect.bisect_left(on, t1)
+        removed = on[i0:i1]
+        rep = []
+        j0, j1 = i0, i1
+        if i0 % 2 == 1:
+            removed.insert(0, t0)
+            if on[i0 - 1] == t0:
+                j0 -= 1
+            else:
+                rep.append(t0)
+        if i1 % 2 == 1:
+            removed.append(t1)
+            if on[i1] == t1:
+                j1 += 1
+            else:
+                rep.append(t1)
+        on[j0:j1] = rep
+        if running:
+            on.pop()
+        it = iter(removed)
+        return zip(it, it)
+
+    def put_sessions(self, ses):
+        """ adds [(on, off)] sessions uniting them with overlapping
+            or adjacent ones
+        """
+        ses = sorted(x for x in ses if x[1] > x[0])
+        if len(ses) == 0:
+            return
+        running = self._close_running()
+        on = self.onoff
+        # slice of sessions which end not before the first new start and
+        # start not after the last new end
+        i0 = bisect.bisect_left(on, ses[0][0])
+        i0 -= i0 % 2
+        i1 = bisect.bisect_right(on, max(x[1] for x in ses))
+        i1 += i1 % 2
+        it = iter(on[i0:i1])
+        ret = []
+        for a, b in sorted(zip(it, it) + ses):
+            if ret and a <= ret[-1]:
+                ret[-1] = max(ret[-1], b)
+            else:
+                ret.extend([a, b])
+        on[i0:i1] = ret
+        if running:
+            on.pop()
+
+    def merge_sessions(self, t0, t1, max_gap=None):
+        """ merges consecutive sessions which start within [t0, t1)
+            if pause between them is not longer than max_gap seconds
+            (None - any pause). Returns number of removed pauses.
+        """
+        running = self._close_running()
+        on = self.onoff
+        i0 = bisect.bisect_left(on, t0)
+        i0 += i0 % 2
+        i1 = bisect.bisect_left(on, t1)
+        i1 += i1 % 2
+        seg = on[i0:i1]
+        ret = seg[:1]
+        for k in range(1, len(seg) - 1, 2):
+            # keep pauses longer than max_gap
+            if max_gap is not None and seg[k + 1] - seg[k] > max_gap:
+                ret.extend(seg[k:k + 2])
+        ret.extend(seg[-1:])
+        on[i0:i1] = ret
+        if running:
+            on.pop()
+        return (len(seg) - len(ret)) / 2
+
+    def split_session(self, tm, gap=1):
+        """ splits session which goes on at tm into two with a pause
+            [tm, tm + gap]. Returns False if task was not on at tm.
+        """
+        running = self._close_running()
+        on = self.onoff
+        i = bisect.bisect_right(on, tm)
+        ok = i % 2 == 1 and on[i - 1] < tm and tm + gap < on[i]
+        if ok:
+            on[i:i] = [tm, tm + gap]
+        if running:
+            on.pop()
+        return ok
+
+    def drop_short_sessions(self, min_length, t0=None, t1=None):
+        """ ->[(on, off)]. Removes closed sessions shorter than min_length
+            seconds which start within [t0, t1). Returns removed sessions.
+        """
+        on = self.onoff
+        n = len(on) - len(on) % 2
+        i0 = 0 if t0 is None else bisect.bisect_left(on, t0, 0, n)
+        i0 += i0 % 2
+        i1 = n if t1 is None else bisect.bisect_left(on, t1, 0, n)
+        i1 += i1 % 2
+        it = iter(on[i0:i1])
+        seg = zip(it, it)
+        removed = [x for x in seg if x[1] - x[0] < min_length]
+        if removed:
+            ret = []
+            for x in seg:
+                if x[1] - x[0] >= min_length:
+                    ret.extend(x)
+            on[i0:i1] = ret
+        return removed
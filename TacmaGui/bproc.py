@@ -1,5 +1,6 @@
 import copy
 import os.path
+from array import array
 
 
 def resfile(fname):
@@ -223,6 +224,41 @@ class PieceWiseFun(object):
 
         return ret
 
+    def section_index(self, t):
+        """ -> int.
+            Index of the first section which ends after t.
+            Equals secnum() if there is no such section.
+        """
+        lo, hi = 0, len(self._dt)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._dt[mid][1] <= t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def integral_from(self, i, t0, t1):
+        """ -> (float, int).
+            Computes integral on [t0, t1] starting search from i-th section.
+            Returns integral value and index of the first section which
+            ends after t0. This index could be passed to the next call
+            with larger t0, so a sequence of calls on growing intervals
+            costs only the number of passed sections.
+        """
+        dt = self._dt
+        n = len(dt)
+        while i < n and dt[i][1] <= t0:
+            i += 1
+        ret = 0
+        if t1 <= t0:
+            return ret, i
+        j = i
+        while j < n and dt[j][0] < t1:
+            ret += (min(t1, dt[j][1]) - max(t0, dt[j][0])) * dt[j][2]
+            j += 1
+        return ret, i
+
     def __str__(self):
         ret = ''
         for d in self._dt:
@@ -254,21 +290,105 @@ class PieceWiseFun(object):
     @classmethod
     def _same_stencil(cls, fun):
         '-> [cls]. decomposes fun[0], fun[1], ... to same partition'
-        c = set()
+        bps, cols = cls.stencil(fun)
+        ret = [cls() for i in range(len(fun))]
+        for i in range(len(bps) - 1):
+            v = [col[i - i0] if i0 <= i < i0 + len(col) else 0
+                 for i0, col in cols]
+            if not all(map(lambda x: x == 0, v)):
+                for f, x in zip(ret, v):
+                    f._dt.append((bps[i], bps[i + 1], x))
+        return ret
+
+    @classmethod
+    def stencil(cls, fun):
+        """ ([cls]) -> ([float], [(int, array)]).
+            Builds global partition of fun[0], fun[1], ...
+            Returns sorted breakpoints t and for each function its
+            values on [t[i], t[i+1]] intervals starting from its own first
+            breakpoint: (i0, [v(i0), v(i0+1), ...]).
+            Only change points are stored, so the cost is proportional to
+            the number of breakpoints covered by each function.
+        """
+        bps = set()
         for f in fun:
             for d in f._dt:
-                c.add(d[0])
-                c.add(d[1])
-        c = sorted(c)
-        ret = [cls() for i in range(len(fun))]
+                bps.add(d[0])
+                bps.add(d[1])
+        bps = sorted(bps)
+        pos = {t: i for i, t in enumerate(bps)}
+        cols = []
+        for f in fun:
+            if f.secnum() == 0:
+                cols.append((0, array('d')))
+                continue
+            i0 = pos[f._dt[0][0]]
+            col = array('d', [0]) * (pos[f._dt[-1][1]] - i0)
+            for d in f._dt:
+                for i in range(pos[d[0]] - i0, pos[d[1]] - i0):
+                    col[i] = d[2]
+            cols.append((i0, col))
+        return bps, cols
 
-        for i in range(len(c) - 1):
-            t0, t1 = c[i], c[i + 1]
-            tav = (t0 + t1) / 2.0
-            v = [f.val(tav) for f in fun]
-            if not all(map(lambda x: x == 0, v)):
-                for i in range(len(fun)):
-                    ret[i].add_section(t0, t1, v[i])
+    @classmethod
+    def from_stencil(cls, bps, i0, vals):
+        """ -> cls.
+            Builds function from its values on [bps[i], bps[i+1]]
+            intervals starting from i0-th one. Zero values are dropped,
+            equal neighbouring values are joined.
+        """
+        ret = cls()
+        dt = ret._dt
+        for k, v in enumerate(vals):
+            if v == 0:
+                continue
+            t0, t1 = bps[i0 + k], bps[i0 + k + 1]
+            if len(dt) > 0 and dt[-1][2] == v and dt[-1][1] == t0:
+                dt[-1] = (dt[-1][0], t1, v)
+            else:
+                dt.append((t0, t1, v))
+        return ret
+
+    @classmethod
+    def union(cls, fun):
+        """ ([cls]) -> cls.
+            Function which equals 1 where any of fun is defined.
+        """
+        secs = sorted((d[0], d[1]) for f in fun for d in f._dt)
+        ret = cls()
+        dt = ret._dt
+        for t0, t1 in secs:
+            if len(dt) > 0 and t0 <= dt[-1][1]:
+                if t1 > dt[-1][1]:
+                    dt[-1] = (dt[-1][0], t1, 1)
+            else:
+                dt.append((t0, t1, 1))
+        return ret
+
+    @classmethod
+    def product(cls, f1, f2):
+        """ (cls, cls) -> cls.
+            Product of two functions computed by a single pass
+            through both section lists.
+        """
+        ret = cls()
+        dt = ret._dt
+        a, b = f1._dt, f2._dt
+        i, j = 0, 0
+        while i < len(a) and j < len(b):
+            t0 = max(a[i][0], b[j][0])
+            t1 = min(a[i][1], b[j][1])
+            if t0 < t1:
+                v = a[i][2] * b[j][2]
+                if v != 0:
+                    if len(dt) > 0 and dt[-1][2] == v and dt[-1][1] == t0:
+                        dt[-1] = (dt[-1][0], t1, v)
+                    else:
+                        dt.append((t0, t1, v))
+            if a[i][1] <= b[j][1]:
+                i += 1
+            else:
+                j += 1
         return ret
 
     def _simplify_stencil(self):
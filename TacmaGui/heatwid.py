@@ -0,0 +1,113 @@
+from PyQt5 import QtWidgets, QtCore, QtGui
+import bproc
+
+
+class HeatmapView(QtWidgets.QWidget):
+    'paints hour of week histogram'
+    days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+    def __init__(self, parent=None):
+        super(HeatmapView, self).__init__(parent)
+        # 7 x (24 * bins) matrix of seconds
+        self._hist = [[0] * 24 for i in range(7)]
+        self._max = 0
+        self.setMinimumSize(400, 160)
+        self.setMouseTracking(True)
+
+    def set_data(self, hist):
+        ' hist -- [[float]] matrix from TacmaStat.heatmap'
+        self._hist = hist
+        self._max = max(max(r) for r in hist)
+        self.update()
+
+    def _geometry(self):
+        '->(left margin, top margin, cell width, cell height)'
+        fm = self.fontMetrics()
+        x0 = fm.width('Wed') + 6
+        y0 = fm.height() + 4
+        cw = float(self.width() - x0) / len(self._hist[0])
+        ch = float(self.height() - y0) / 7
+        return x0, y0, cw, ch
+
+    def paintEvent(self, event):  # NOQA
+        p = QtGui.QPainter(self)
+        x0, y0, cw, ch = self._geometry()
+        bins = len(self._hist[0]) / 24
+        p.setPen(self.palette().color(QtGui.QPalette.WindowText))
+        for h in range(0, 24, 3):
+            p.drawText(QtCore.QRectF(x0 + h * bins * cw, 0, 3 * bins * cw,
+                                     y0), QtCore.Qt.AlignLeft, str(h))
+        for i, d in enumerate(self.days):
+            p.drawText(QtCore.QRectF(0, y0 + i * ch, x0, ch),
+                       QtCore.Qt.AlignVCenter, d)
+        p.setPen(QtCore.Qt.NoPen)
+        for i, row in enumerate(self._hist):
+            for j, v in enumerate(row):
+                c = 255 - int(255 * v / self._max) if self._max > 0 else 255
+                p.setBrush(QtGui.QColor(c, c, 255))
+                p.drawRect(QtCore.QRectF(x0 + j * cw, y0 + i * ch, cw, ch))
+
+    def mouseMoveEvent(self, event):  # NOQA
+        x0, y0, cw, ch = self._geometry()
+        i = int((event.y() - y0) / ch)
+        j = int((event.x() - x0) / cw)
+        if event.x() < x0 or event.y() < y0 or i >= 7 or \
+                j >= len(self._hist[0]):
+            QtWidgets.QToolTip.hideText()
+            return
+        bins = len(self._hist[0]) / 24
+        QtWidgets.QToolTip.showText(
+            event.globalPos(), '%s %02i:%02i: %s' % (
+                self.days[i], j / bins, (j % bins) * 60 / bins,
+                bproc.sec_to_strtime_interval(self._hist[i][j], True)), self)
+
+
+class HeatmapDialog(QtWidgets.QDialog):
+    'hour of week activity of a task or of all tasks'
+    stat_ready = QtCore.pyqtSignal()
+
+    def __init__(self, dt, parent=None):
+        super(HeatmapDialog, self).__init__(parent)
+        self.dt = dt
+        self.setWindowTitle('Weekly activity')
+        self.view = HeatmapView(self)
+        self.task = QtWidgets.QComboBox(self)
+        self.bins = QtWidgets.QComboBox(self)
+        for s, b in [('1 hour', 1), ('30 min', 2), ('15 min', 4)]:
+            self.bins.addItem(s, b)
+        self.task.activated.connect(self.refresh)
+        self.bins.activated.connect(self.refresh)
+        self.stat_ready.connect(self.refresh)
+        dt.stat.subscribe_ready(self.stat_ready.emit)
+
+        hlayout = QtWidgets.QHBoxLayout()
+        hlayout.addWidget(self.task, 1)
+        hlayout.addWidget(self.bins)
+        mainlayout = QtWidgets.QVBoxLayout(self)
+        mainlayout.addLayout(hlayout)
+        mainlayout.addWidget(self.view, 1)
+        self.setLayout(mainlayout)
+
+    def showEvent(self, event):  # NOQA
+        self._fill_tasks()
+        self.refresh()
+        super(HeatmapDialog, self).showEvent(event)
+
+    def _fill_tasks(self):
+        ' fills task selector keeping current choice'
+        cur = self.task.itemData(self.task.currentIndex())
+        self.task.clear()
+        self.task.addItem('All tasks', None)
+        for a in self.dt.acts:
+            self.task.addItem(a.name, a.iden)
+        i = self.task.findData(cur)
+        self.task.setCurrentIndex(max(0, i))
+
+    def refresh(self):
+        ' reads histogram of chosen task from statistics cache'
+        if not self.isVisible():
+            return
+        iden = self.task.itemData(self.task.currentIndex())
+        bins = self.bins.itemData(self.bins.currentIndex())
+        idens = None if iden is None else [iden]
+        self.view.set_data(self.dt.stat.heatmap(idens, bins))
@@ -1,21 +1,45 @@
 from PyQt5 import QtWidgets, QtCore, QtGui
 from mtab import MainWindowTable, ViewModel
 import tacmaopt
-from wfile import TacmaData
+from wfile import TacmaData, DataUI
 import bproc
 from traywid import TrayIcon
 import functools
 
 
+class DialogUI(DataUI):
+    'TacmaData interaction through message boxes'
+    def warning(self, txt):
+        QtWidgets.QMessageBox.warning(None, "Tacma Warning", txt)
+
+    def confirm(self, txt):
+        a = QtWidgets.QMessageBox.question(
+            None, "Tacma Error",
+            txt, QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+        return a == QtWidgets.QMessageBox.Yes
+
+
 class MainWindow(QtWidgets.QMainWindow):
     "application main window"
 
-    def __init__(self, fn):
+    def __init__(self, fn, ticon=None, data=None):
+        """ fn - data file,
+            ticon - TrayIcon shown before data loading or None,
+            data - TacmaData read from fn in another thread or None
+        """
         super(MainWindow, self).__init__()
-        self.data = TacmaData(fn)
+        if data is None:
+            data = TacmaData(fn, threaded_stat=True, ui=DialogUI())
+        else:
+            data.ui = DialogUI()
+        self.data = data
+        # coalesce events emitted within one event loop turn
+        self.data.emitter.defer = functools.partial(
+            QtCore.QTimer.singleShot, 0)
         self.setUi()
         # -- tray icon
-        self.ticon = TrayIcon(self)
+        self.ticon = ticon if ticon is not None else TrayIcon()
+        self.ticon.set_window(self)
         self.ticon.show()
 
         #autosave and save at exit
@@ -27,6 +51,10 @@ class MainWindow(QtWidgets.QMainWindow):
             self.timer_bautosave = QtCore.QTimer(self)
             self.timer_bautosave.timeout.connect(self._bautosave)
             self.timer_bautosave.start(tacmaopt.opt.backup_autosave * 60000)
+        # data file could be modified by tacma-cli
+        self.watcher = QtCore.QFileSystemWatcher([fn], self)
+        self.watcher.fileChanged.connect(self._file_changed)
+
         import atexit
         atexit.register(self._autosave)
         atexit.register(tacmaopt.opt.write)
@@ -41,6 +69,15 @@ class MainWindow(QtWidgets.QMainWindow):
         #menu
         menubar = self.menuBar()
         filemenu = menubar.addMenu('&File')
+        quick_action = QtWidgets.QAction('&Quick switch...', self)
+        quick_action.setShortcut(QtGui.QKeySequence('Ctrl+K'))
+        quick_action.triggered.connect(self.show_quick_switch)
+        filemenu.addAction(quick_action)
+        self.quickdlg = None
+        compact_action = QtWidgets.QAction('&Compact history', self)
+        compact_action.triggered.connect(self.compact_history)
+        filemenu.addAction(compact_action)
+        filemenu.addSeparator()
         exit_action = QtWidgets.QAction('E&xit', self)
         exit_action.setShortcut(QtGui.QKeySequence.Close)
         exit_action.triggered.connect(QtWidgets.qApp.quit)
@@ -63,11 +100,33 @@ class MainWindow(QtWidgets.QMainWindow):
         for v in viewsubs:
             if v is not None:
                 viewmenu.addAction(v)
+        viewmenu.addSeparator()
+        heat_action = QtWidgets.QAction('&Weekly activity...', self)
+        heat_action.triggered.connect(self.show_heatmap)
+        viewmenu.addAction(heat_action)
+        self.heatdlg = None
 
         #central widget
         self.tab = MainWindowTable(self.data, self)
         self.setCentralWidget(self.tab)
 
+        #filter toolbar
+        fm = self.tab.fmodel
+        toolbar = self.addToolBar('Filter')
+        alive = QtWidgets.QCheckBox('Alive only', self)
+        alive.toggled.connect(fm.set_alive_only)
+        toolbar.addWidget(alive)
+        search = QtWidgets.QLineEdit(self)
+        search.setPlaceholderText('Search')
+        search.textChanged.connect(fm.set_name_filter)
+        toolbar.addWidget(search)
+        minact = QtWidgets.QSpinBox(self)
+        minact.setRange(0, 7 * 24 * 60)
+        minact.setPrefix('Last week >= ')
+        minact.setSuffix(' min')
+        minact.valueChanged.connect(lambda v: fm.set_min_activity(60 * v))
+        toolbar.addWidget(minact)
+
     def resizeEvent(self, event):  # NOQA
         'write window size on options file'
         super(MainWindow, self).resizeEvent(event)
@@ -92,6 +151,35 @@ class MainWindow(QtWidgets.QMainWindow):
         tacmaopt.opt.colvisible[colcode] = val
         self.tab.setColumnHidden(colint, not val)
 
+    def show_quick_switch(self):
+        if self.quickdlg is None:
+            from quickwid import QuickSwitchDialog
+            self.quickdlg = QuickSwitchDialog(self.data, self)
+        self.quickdlg.show()
+        self.quickdlg.activateWindow()
+
+    def show_heatmap(self):
+        if self.heatdlg is None:
+            from heatwid import HeatmapDialog
+            self.heatdlg = HeatmapDialog(self.data, self)
+        self.heatdlg.show()
+        self.heatdlg.raise_()
+
+    def compact_history(self):
+        'removes history entries which carry no information'
+        n0 = sum(len(a.onoff) + len(a.prior) for a in self.data.acts)
+        n1, n2 = self.data.compact()
+        txt = 'Removed %d on/off and %d priority entries' % (n1, n2)
+        if n0 > 0:
+            txt += ' (%.1f%% of history)' % (100.0 * (n1 + n2) / n0)
+        QtWidgets.QMessageBox.information(self, 'Compact history', txt)
+
+    def _file_changed(self, path):
+        self.data.reload_if_changed()
+        # file could be replaced and dropped from the watcher
+        if path not in self.watcher.files():
+            self.watcher.addPath(path)
+
     def _autosave(self):
         'save to opt.autosave'
         self.data.write_data()
@@ -1,5 +1,7 @@
 import functools
-import copy
+import bisect
+import datetime
+import heapq
 import bproc
 from PyQt5 import QtWidgets, QtCore, QtGui
 import tacmaopt
@@ -7,6 +9,14 @@ from dlg_datetime import DateTimeDialog
 
 
 class ManualModifyDialog(QtWidgets.QDialog):
+    """ Edits on/off and priority history of a task.
+        Only records within the chosen date range are shown.
+        Edits are kept as differences against the task data and
+        applied on OK.
+    """
+    # default length of shown date range in days
+    page_days = 30
+
     def __init__(self, dt, act, parent=None):
         super(ManualModifyDialog, self).__init__(parent)
         self.act = act
@@ -17,6 +27,31 @@ class ManualModifyDialog(QtWidgets.QDialog):
         self.onofftab = OnoffTable(dt, act, self)
         self.pritab = PriTable(dt, act, self)
 
+        # shown date range. By default a page which ends at the last
+        # activity of the task
+        last = dt.int_to_time(act.onoff[-1]) if act.onoff else\
+            datetime.datetime.utcnow()
+        d1 = QtCore.QDate(last.year, last.month, last.day)
+        self.date0 = QtWidgets.QDateEdit(d1.addDays(-self.page_days), self)
+        self.date1 = QtWidgets.QDateEdit(d1, self)
+        for w in [self.date0, self.date1]:
+            w.setCalendarPopup(True)
+            w.setDisplayFormat('yyyy/MM/dd')
+            w.dateChanged.connect(self._range_changed)
+        prev_button = QtWidgets.QPushButton('<', self)
+        prev_button.clicked.connect(functools.partial(self._shift_range, -1))
+        next_button = QtWidgets.QPushButton('>', self)
+        next_button.clicked.connect(functools.partial(self._shift_range, 1))
+        rangelayout = QtWidgets.QHBoxLayout()
+        rangelayout.addWidget(prev_button)
+        rangelayout.addWidget(QtWidgets.QLabel('From', self))
+        rangelayout.addWidget(self.date0)
+        rangelayout.addWidget(QtWidgets.QLabel('to', self))
+        rangelayout.addWidget(self.date1)
+        rangelayout.addWidget(next_button)
+        rangelayout.addStretch()
+        self._range_changed()
+
         # button box
         bbox = QtWidgets.QDialogButtonBox(self)
         bbox.setStandardButtons(QtWidgets.QDialogButtonBox.Cancel |
@@ -36,11 +71,12 @@ class ManualModifyDialog(QtWidgets.QDialog):
 
         # fill layout
         mainlayout = QtWidgets.QGridLayout(self)
-        mainlayout.addWidget(onoff_label, 0, 0)
-        mainlayout.addWidget(pri_label, 0, 1)
-        mainlayout.addWidget(self.onofftab, 1, 0)
-        mainlayout.addWidget(self.pritab, 1, 1)
-        mainlayout.addWidget(bbox, 2, 0, 2, 0)
+        mainlayout.addLayout(rangelayout, 0, 0, 1, 2)
+        mainlayout.addWidget(onoff_label, 1, 0)
+        mainlayout.addWidget(pri_label, 1, 1)
+        mainlayout.addWidget(self.onofftab, 2, 0)
+        mainlayout.addWidget(self.pritab, 2, 1)
+        mainlayout.addWidget(bbox, 3, 0, 1, 2)
         mainlayout.setColumnStretch(0, 3)
         mainlayout.setColumnStretch(1, 2)
         self.setLayout(mainlayout)
@@ -57,17 +93,36 @@ class ManualModifyDialog(QtWidgets.QDialog):
         tacmaopt.opt.mod_window_x0 = self.x()
         tacmaopt.opt.mod_window_y0 = self.y()
 
+    def _range_changed(self, *args):
+        'shows records of the date range'
+        d0, d1 = self.date0.date(), self.date1.date().addDays(1)
+        t0 = self.dt.time_to_int(datetime.datetime(
+            d0.year(), d0.month(), d0.day()))
+        t1 = self.dt.time_to_int(datetime.datetime(
+            d1.year(), d1.month(), d1.day()))
+        self.onofftab.model().set_range(t0, t1)
+        self.pritab.model().set_range(t0, t1)
+        self.onofftab.scrollToBottom()
+        self.pritab.scrollToBottom()
+
+    def _shift_range(self, direction):
+        'moves date range by its length backward (-1) or forward (1)'
+        n = self.date0.date().daysTo(self.date1.date()) + 1
+        for w in [self.date0, self.date1]:
+            w.blockSignals(True)
+            w.setDate(w.date().addDays(direction * n))
+            w.blockSignals(False)
+        self._range_changed()
+
     def _modify_onoff(self):
-        newd = copy.deepcopy(self.onofftab.model().onoff)
-        if len(self.act.onoff) % 2 == 1:
-            newd.append(self.act.onoff[-1])
-        if newd != self.act.onoff:
-            self.dt.reset_action_onoff(self.act.iden, newd)
+        m = self.onofftab.model()
+        if m.hist.changed():
+            self.dt.reset_action_onoff(self.act.iden, m.new_onoff())
 
     def _modify_prior(self):
-        newd = copy.deepcopy(self.pritab.model().pri)
-        if newd != self.act.prior:
-            self.dt.reset_action_prior(self.act.iden, newd)
+        m = self.pritab.model()
+        if m.hist.changed():
+            self.dt.reset_action_prior(self.act.iden, m.hist.apply())
 
     def accept(self):
         txt = "Do you really want to make manual changes to action %s?"\
@@ -77,8 +132,9 @@ class ManualModifyDialog(QtWidgets.QDialog):
             txt, QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
         if a == QtWidgets.QMessageBox.Yes:
             self.setResult(self.Accepted)
-            self._modify_onoff()
-            self._modify_prior()
+            with self.dt.batch():
+                self._modify_onoff()
+                self._modify_prior()
 
             super(ManualModifyDialog, self).accept()
 
@@ -95,11 +151,10 @@ class OnoffTable(QtWidgets.QTableView):
             act.created, dt.curtime_to_int(), act.onoff))
         self.setItemDelegate(OnoffTableDelegate(dt))
 
-        # stretch and scroll
+        # stretch
         for i in range(3):
             self.horizontalHeader().setSectionResizeMode(
                 i, QtWidgets.QHeaderView.Stretch)
-        self.scrollToBottom()
 
         # context menu
         self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
@@ -216,19 +271,48 @@ class OnoffTableDelegate(QtWidgets.QItemDelegate):
 
 
 class OnoffViewModel(QtCore.QAbstractTableModel):
+    """ Closed sessions of a task which start within shown range.
+        Edits are collected in self.hist.
+    """
     def __init__(self, mintime, maxtime, onoff):
         super(OnoffViewModel, self).__init__()
-        self.onoff = copy.deepcopy(onoff)
-        if len(self.onoff) % 2 == 1:
-            self.onoff.pop()
+        self._src = onoff
+        self.hist = HistoryDiff(_Sessions(onoff))
         self.mintime = mintime
         self.maxtime = maxtime
+        # shown range and [(on, off)] sessions within it
+        self.t0, self.t1 = mintime, mintime
+        self.rows = []
+
+    def set_range(self, t0, t1):
+        self.t0, self.t1 = t0, t1
+        self._load()
+
+    def _load(self):
+        self.beginResetModel()
+        self.rows = self.hist.records(self.t0, self.t1)
+        self.endResetModel()
+
+    def new_onoff(self):
+        '-> on/off list with all edits applied'
+        ret = []
+        # overlapping sessions are united
+        for a, b in self.hist.apply():
+            if ret and a <= ret[-1]:
+                ret[-1] = max(ret[-1], b)
+            else:
+                ret.extend([a, b])
+        if len(self._src) % 2 == 1:
+            on = self._src[-1]
+            while ret and on <= ret[-1]:
+                on = min(on, ret[-2])
+                del ret[-2:]
+            ret.append(on)
+        return ret
 
     def _remove_row(self, irow):
         self.beginRemoveRows(QtCore.QModelIndex(), irow, irow)
-        del self.onoff[2 * irow]
-        del self.onoff[2 * irow]
-        self.removeRow(irow)
+        self.hist.remove(self.rows.pop(irow))
         self.endRemoveRows()
 
     def _check_interval(self, interval):
@@ -246,20 +330,21 @@ class OnoffViewModel(QtCore.QAbstractTableModel):
         return True
 
     def _append_interval(self, interval):
-        self.beginResetModel()
-        it = iter(self.onoff)
-        ab = [(a, b, 1) for a, b in zip(it, it)]
-        pw = bproc.PieceWiseFun.raw_create(ab)
-        pw.add_section(interval[0], interval[1], 1)
-        del self.onoff[:]
-        for it in pw._dt:
-            self.onoff.append(int(it[0]))
-            self.onoff.append(int(it[1]))
-        self.endResetModel()
+        'adds session uniting it with overlapping ones'
+        a, b = interval
+        prev = self.hist.before(a)
+        if prev is not None and prev[1] >= a:
+            self.hist.remove(prev)
+            a, b = prev[0], max(b, prev[1])
+        for r in self.hist.records(a, b + 1):
+            self.hist.remove(r)
+            b = max(b, r[1])
+        self.hist.add((a, b))
+        self._load()
 
     def rowCount(self, parent=None):  # NOQA
         "overriden"
-        return len(self.onoff) / 2
+        return len(self.rows)
 
     def columnCount(self, parent=None):  # NOQA
         "overriden"
@@ -283,13 +368,13 @@ class OnoffViewModel(QtCore.QAbstractTableModel):
         if not index.isValid():
             return None
         if role == QtCore.Qt.DisplayRole:
-            ir = 2 * index.row()
+            a, b = self.rows[index.row()]
             if index.column() == 0:
-                return self.onoff[ir]
+                return a
             elif index.column() == 1:
-                return self.onoff[ir + 1]
+                return b
             else:
-                return self.onoff[ir + 1] - self.onoff[ir]
+                return b - a
         return None
 
     def flags(self, index):
@@ -303,17 +388,17 @@ class OnoffViewModel(QtCore.QAbstractTableModel):
             if value == self.data(index, QtCore.Qt.DisplayRole):
                 return False
 
-            # check if value is valid
-            newinterval = self.onoff[2 * ir:2 * ir + 2]
-
-            if not self._check_interval(newinterval):
-                return False
-
             # set value
+            newinterval = list(self.rows[ir])
             if index.column() == 0:
                 newinterval[0] = value
             elif index.column() == 1:
                 newinterval[1] = value
+
+            # check if value is valid
+            if not self._check_interval(newinterval):
+                return False
+
             self._remove_row(ir)
             self._append_interval(newinterval)
             return True
@@ -328,11 +413,10 @@ class PriTable(QtWidgets.QTableView):
         self.setModel(PriViewModel(
             act.created, dt.curtime_to_int(), act.prior))
         self.setItemDelegate(PriTableDelegate(dt))
-        # stretch and scroll
+        # stretch
         for i in range(2):
             self.horizontalHeader().setSectionResizeMode(
                 i, QtWidgets.QHeaderView.Stretch)
-        self.scrollToBottom()
 
         # context menu
         self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
@@ -419,16 +503,30 @@ class PriTableDelegate(QtWidgets.QItemDelegate):
 
 
 class PriViewModel(QtCore.QAbstractTableModel):
+    """ Priority changes of a task within shown range.
+        Edits are collected in self.hist.
+    """
     def __init__(self, mintime, maxtime, pri):
         super(PriViewModel, self).__init__()
-        self.pri = copy.deepcopy(pri)
+        self.hist = HistoryDiff(pri)
         self.mintime = mintime
         self.maxtime = maxtime
+        # shown range and [(time, priority)] changes within it
+        self.t0, self.t1 = mintime, mintime
+        self.pri = []
+
+    def set_range(self, t0, t1):
+        self.t0, self.t1 = t0, t1
+        self._load()
+
+    def _load(self):
+        self.beginResetModel()
+        self.pri = self.hist.records(self.t0, self.t1)
+        self.endResetModel()
 
     def _remove_row(self, irow):
         self.beginRemoveRows(QtCore.QModelIndex(), irow, irow)
-        del self.pri[irow]
-        self.removeRow(irow)
+        self.hist.remove(self.pri.pop(irow))
         self.endRemoveRows()
 
     def _check_starttime(self, tm):
@@ -444,18 +542,11 @@ class PriViewModel(QtCore.QAbstractTableModel):
         return True
 
     def _append_value(self, tm, val):
-        insert_at = 0
-        while insert_at < len(self.pri) and self.pri[insert_at][0] < tm:
-            insert_at += 1
-        if insert_at < len(self.pri) and self.pri[insert_at] == tm:
-            self.setData(self.index(insert_at, 1), val)
-            return
-        self.beginInsertRows(QtCore.QModelIndex(), insert_at, insert_at)
-        self.insertRow(insert_at)
-        self.pri.insert(insert_at, (tm, val))
-        self.endInsertRows()
-        self.setData(self.index(insert_at, 0), tm, QtCore.Qt.EditRole)
-        self.setData(self.index(insert_at, 1), val, QtCore.Qt.EditRole)
+        'sets priority change at tm replacing existing one'
+        for r in self.hist.records(tm, tm + 1):
+            self.hist.remove(r)
+        self.hist.add((tm, val))
+        self._load()
 
     def rowCount(self, parent=None):  # NOQA
         "overriden"
@@ -509,10 +600,94 @@ class PriViewModel(QtCore.QAbstractTableModel):
                     return False
 
             # set value
+            tm, val = self.pri[index.row()]
+            self.hist.remove((tm, val))
             if index.column() == 0:
-                self.pri[index.row()] = (value, self.pri[index.row()][1])
+                tm = value
             if index.column() == 1:
-                self.pri[index.row()] = (self.pri[index.row()][0], value)
+                val = value
+            self._append_value(tm, val)
             return True
 
         return True
+
+
+class _Sessions(object):
+    """ Read only sequence of closed (on, off) sessions
+        over a flat on/off list.
+    """
+    def __init__(self, onoff):
+        self._onoff = onoff
+        self._n = len(onoff) / 2
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._n:
+            raise IndexError
+        return (self._onoff[2 * i], self._onoff[2 * i + 1])
+
+
+class HistoryDiff(object):
+    """ Edits of a list of records sorted by time kept as a difference:
+        a set of removed original records and a sorted list of added ones.
+        Records are tuples which start with a time moment.
+        Access to a time range costs O(log(n)) plus size of the range,
+        so original list is never copied until apply().
+    """
+    def __init__(self, records):
+        self._src = records
+        self._removed = set()
+        self._added = []
+
+    def changed(self):
+        '->bool. Whether there are any edits'
+        return len(self._removed) > 0 or len(self._added) > 0
+
+    def records(self, t0, t1):
+        '->[record] which start within [t0, t1) sorted by time'
+        i0 = bisect.bisect_left(self._src, (t0,))
+        i1 = bisect.bisect_left(self._src, (t1,))
+        ret = [self._src[i] for i in xrange(i0, i1)]
+        if self._removed:
+            ret = [x for x in ret if x not in self._removed]
+        j0 = bisect.bisect_left(self._added, (t0,))
+        j1 = bisect.bisect_left(self._added, (t1,))
+        if j0 < j1:
+            ret.extend(self._added[j0:j1])
+            ret.sort()
+        return ret
+
+    def before(self, t):
+        '->last record which starts before t or None'
+        ret = None
+        i = bisect.bisect_left(self._src, (t,)) - 1
+        while i >= 0 and self._src[i] in self._removed:
+            i -= 1
+        if i >= 0:
+            ret = self._src[i]
+        j = bisect.bisect_left(self._added, (t,)) - 1
+        if j >= 0 and (ret is None or self._added[j] > ret):
+            ret = self._added[j]
+        return ret
+
+    def add(self, rec):
+        if rec in self._removed:
+            self._removed.discard(rec)
+        else:
+            bisect.insort(self._added, rec)
+
+    def remove(self, rec):
+        i = bisect.bisect_left(self._added, rec)
+        if i < len(self._added) and self._added[i] == rec:
+            del self._added[i]
+        else:
+            self._removed.add(rec)
+
+    def apply(self):
+        '->[record]. Original list with all edits applied'
+        src = (self._src[i] for i in xrange(len(self._src)))
+        if self._removed:
+            src = (x for x in src if x not in self._removed)
+        return list(heapq.merge(src, self._added))
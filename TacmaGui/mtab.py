@@ -1,16 +1,38 @@
-from PyQt5 import QtWidgets, QtCore
+from PyQt5 import QtWidgets, QtCore, QtGui
+import heapq
+from collections import OrderedDict
+from datetime import datetime
 import tacmaopt
-from addeditwid import AddEditDialog
-from manmodwid import ManualModifyDialog
 import bproc
 import functools
 
 
 class ViewModel(QtCore.QAbstractTableModel):
+    # emitted (possibly from a worker thread) when new statistics are ready
+    stat_ready = QtCore.pyqtSignal()
+    # emitted when time of the next cell change was recomputed
+    timer_updated = QtCore.pyqtSignal()
+
     def __init__(self, dt):
         super(ViewModel, self).__init__()
         self.dt = dt
         dt.emitter.subscribe(self, self._tacma_data_changed)
+        self.stat_ready.connect(self.timer_view_update)
+        dt.stat.subscribe_ready(self.stat_ready.emit)
+        # heap of (time, row key, column code) moments of time dependent
+        # cells changes
+        self._due = []
+        # {row key -> [raw cell values or self._stale]} cache of computed
+        # cells. Row key is a task row or None for the TOTAL row
+        self._rows = {}
+        # number of task rows loaded to the view and number of tasks
+        # at the last model reset
+        self._fetched = min(self.fetch_size, dt.act_count())
+        self._count = dt.act_count()
+        # row keys which have entries in self._due
+        self._scheduled = set()
+        # () -> (rows, column codes) shown by a view or None if all are
+        self.region = None
 
     #table columns names and order
     cnames = {'status': (0, ''),
@@ -25,79 +47,181 @@ class ViewModel(QtCore.QAbstractTableModel):
               'l4w': (9, 'Last 4 weeks'),
               'lses': (10, 'Last session'),
               'idle': (11, 'Idle'),
+              'deficit': (12, 'Behind'),
               }
 
-    @classmethod
-    def _is_column(cls, index, *args):
-        for a in args:
-            if index.column() == cls.cnames[a][0]:
-                return True
-        return False
+    # columns which change through time -> statistics window length
+    timed_columns = {'l24h': 86400,
+                     'l1w': 604800,
+                     'l4w': 2419200,
+                     'lses': None,
+                     'deficit': None,
+                     }
+
+    # number of task rows loaded to the view at once
+    fetch_size = 200
+
+    # data roles: raw value for sorting and TOTAL row flag
+    SortRole = QtCore.Qt.UserRole + 1
+    TotalRole = QtCore.Qt.UserRole + 2
+
+    # marks cached cell which should be recomputed before use
+    _stale = object()
+
+    # column codes by column index
+    ccodes = [k for k, v in sorted(cnames.items(), key=lambda x: x[1][0])]
+
+    def _act_value(self, a, ccode):
+        """ -> raw value of a task cell.
+            Idle column keeps the time of the last stop
+        """
+        iden = a.iden
+        if ccode == 'status':
+            return a.is_on()
+        elif ccode == 'id':
+            return iden
+        elif ccode == 'title':
+            return a.name
+        elif ccode == 'prior':
+            return self.dt.priority(iden)
+        elif ccode == 'weight':
+            return self.dt.weight(iden)
+        elif ccode == 'created':
+            return self.dt.created_time(iden)
+        elif ccode == 'finished':
+            return self.dt.finished_time(iden)
+        elif ccode == 'l24h':
+            return self.dt.stat.real_time(iden, 86400)
+        elif ccode == 'l1w':
+            return (self.dt.stat.must_time(iden, 604800),
+                    self.dt.stat.real_time(iden, 604800))
+        elif ccode == 'l4w':
+            return (self.dt.stat.must_time(iden, 2419200),
+                    self.dt.stat.real_time(iden, 2419200))
+        elif ccode == 'lses':
+            return self.dt.stat.last_session(iden)
+        elif ccode == 'idle':
+            return a.last_stop()
+        elif ccode == 'deficit':
+            return self.dt.sched.deficit(iden)
+
+    def _tot_value(self, ccode):
+        '-> raw value of a TOTAL row cell'
+        if ccode == 'title':
+            return "TOTAL"
+        elif ccode == 'l24h':
+            return int(self.dt.stat.total_working_time(86400))
+        elif ccode == 'l1w':
+            return int(self.dt.stat.total_working_time(604800))
+        elif ccode == 'l4w':
+            return int(self.dt.stat.total_working_time(2419200))
+        elif ccode == 'idle':
+            return self.dt.last_stop()
+        return None
 
-    def _act_data(self, index, role):
-        if role == QtCore.Qt.DisplayRole:
-            iden = self.get_iden(index)
-            if self._is_column(index, 'id'):
-                return iden
-            elif self._is_column(index, 'title'):
-                return self.dt.name(iden)
-            elif self._is_column(index, 'prior'):
-                return self.dt.priority(iden)
-            elif self._is_column(index, 'weight'):
-                return self.dt.weight(iden)
-            elif self._is_column(index, 'created'):
-                return self.dt.created_time(iden)
-            elif self._is_column(index, 'finished'):
-                return self.dt.finished_time(iden)
-            elif self._is_column(index, 'l24h'):
-                return self.dt.stat.real_time(iden, 86400)
-            elif self._is_column(index, 'l1w'):
-                return (self.dt.stat.must_time(iden, 604800),
-                        self.dt.stat.real_time(iden, 604800))
-            elif self._is_column(index, 'l4w'):
-                return (self.dt.stat.must_time(iden, 2419200),
-                        self.dt.stat.real_time(iden, 2419200))
-            elif self._is_column(index, 'lses'):
-                return self.dt.stat.last_session(iden)
-            elif self._is_column(index, 'idle'):
-                curtm = self.dt.curtime_to_int()
-                ls = self.get_act(index).last_stop()
-                if ls is not None:
-                    return curtm - ls
-                else:
-                    return None
-        elif role == QtCore.Qt.CheckStateRole:
-            iden = self.get_iden(index)
-            if self._is_column(index, 'status'):
-                return QtCore.Qt.Checked if self.dt.is_on(iden) \
-                    else QtCore.Qt.Unchecked
+    def _key(self, row):
+        '-> row key by table row'
+        return None if row == self._fetched else row
 
-    def _tot_data(self, index, role):
-        if role == QtCore.Qt.DisplayRole:
-            if self._is_column(
-                    index, 'id', 'prior', 'weight',
-                    'created', 'finished', 'lses'):
-                return None
-            elif self._is_column(index, 'title'):
-                return "TOTAL"
-            elif self._is_column(index, 'l24h'):
-                return int(self.dt.stat.total_working_time(86400))
-            elif self._is_column(index, 'l1w'):
-                return int(self.dt.stat.total_working_time(604800))
-            elif self._is_column(index, 'l4w'):
-                return int(self.dt.stat.total_working_time(2419200))
-            elif self._is_column(index, 'idle'):
-                if self.dt.active_task() is not None:
-                    return None
-                ad = []
-                for i in range(self.dt.act_count()):
-                    aind = self.index(i, index.column())
-                    ad.append(self._act_data(aind, role))
-                return min(ad)
+    def _row(self, key):
+        '-> table row by row key'
+        return self._fetched if key is None else key
+
+    def _value(self, key, ccode):
+        '-> raw value of a cell computed from data'
+        if key >= self.dt.act_count():
+            # task was removed and the model is not reset yet
+            return None
+        elif key is not None:
+            return self._act_value(self.dt.acts[key], ccode)
+        else:
+            return self._tot_value(ccode)
+
+    def _row_values(self, row):
+        """ -> [raw values or self._stale]. Cells of a row are computed on
+            first request and kept until refresh
+        """
+        key = self._key(row)
+        ret = self._rows.get(key)
+        if ret is None:
+            ret = [self._stale] * len(self.ccodes)
+            self._rows[key] = ret
+        return ret
+
+    def _cell(self, row, col):
+        '-> cached raw value of a cell'
+        vals = self._row_values(row)
+        if vals[col] is self._stale:
+            vals[col] = self._value(self._key(row), self.ccodes[col])
+        return vals[col]
+
+    def _region(self):
+        '-> (set of row keys, set of column codes) shown by a view'
+        if self.region is None:
+            return set(range(self._fetched) + [None]), set(self.ccodes)
+        rows, ccodes = self.region()
+        return set(self._key(r) for r in rows), set(ccodes)
+
+    def sort_value(self, row, ccode):
+        '-> cached value of a cell used for sorting'
+        v = self._cell(row, self.cnames[ccode][0])
+        if ccode in ['l1w', 'l4w'] and isinstance(v, tuple):
+            return v[1]
+        if ccode == 'idle' and v is not None:
+            return -v
+        return v
+
+    def refresh(self, rows=None, ccodes=None):
+        """ recomputes cached values of given rows and columns and
+            emits dataChanged for cells whose values have changed.
+            Only cells shown by a view are recomputed, others are dropped
+            from cache and will be computed when requested.
+            rows -- row keys, None -> all cached rows
+            ccodes=None -> all columns
+        """
+        if rows is None:
+            rows = self._rows.keys()
+        if ccodes is None:
+            ccodes = self.ccodes
+        vis_rows, vis_cols = self._region()
+        for key in rows:
+            vals = self._rows.get(key)
+            if vals is None:
+                continue
+            if key not in vis_rows:
+                self._rows.pop(key)
+                continue
+            for c in ccodes:
+                col = self.cnames[c][0]
+                if c not in vis_cols:
+                    vals[col] = self._stale
+                    continue
+                if vals[col] is self._stale:
+                    continue
+                v = self._value(key, c)
+                if v != vals[col]:
+                    vals[col] = v
+                    i = self.createIndex(self._row(key), col)
+                    self.dataChanged.emit(i, i)
 
     def rowCount(self, parent=None):  # NOQA
         "overriden"
-        return 0 if self.dt.act_count() == 0 else self.dt.act_count() + 1
+        return 0 if self._fetched == 0 else self._fetched + 1
+
+    def canFetchMore(self, parent):  # NOQA
+        "overriden"
+        return self._fetched < self.dt.act_count()
+
+    def fetchMore(self, parent):  # NOQA
+        "overriden. Loads next portion of task rows before TOTAL row"
+        n = min(self.fetch_size, self.dt.act_count() - self._fetched)
+        if n <= 0:
+            return
+        self.beginInsertRows(
+            QtCore.QModelIndex(), self._fetched, self._fetched + n - 1)
+        self._fetched += n
+        self.endInsertRows()
+        self.region_changed()
 
     def columnCount(self, parent=None):  # NOQA
         "overriden"
@@ -115,13 +239,25 @@ class ViewModel(QtCore.QAbstractTableModel):
 
     def data(self, index, role):
         "overriden"
-        if not index.isValid():
+        if not index.isValid() or index.row() >= self.rowCount():
             return None
-        if index.row() < self.dt.act_count():
-            return self._act_data(index, role)
-        elif index.row() == self.dt.act_count():
-            return self._tot_data(index, role)
-
+        ccode = self.ccodes[index.column()]
+        if role == self.TotalRole:
+            return index.row() == self._fetched
+        elif role == self.SortRole:
+            return self.sort_value(index.row(), ccode)
+        elif role == QtCore.Qt.DisplayRole:
+            if ccode == 'status':
+                return None
+            v = self._cell(index.row(), index.column())
+            if ccode == 'idle' and v is not None:
+                return self.dt.curtime_to_int() - v
+            return v
+        elif role == QtCore.Qt.CheckStateRole:
+            if ccode == 'status' and index.row() < self._fetched:
+                return QtCore.Qt.Checked \
+                    if self._cell(index.row(), index.column()) \
+                    else QtCore.Qt.Unchecked
         return None
 
     def setData(self, index, value, role):  # NOQA
@@ -139,33 +275,28 @@ class ViewModel(QtCore.QAbstractTableModel):
     def flags(self, index):
         "overriden"
         ret = QtCore.Qt.NoItemFlags | QtCore.Qt.ItemIsEnabled
-        if index.row() < self.dt.act_count() and\
-                self._is_column(index, 'status'):
+        if index.row() < self._fetched and\
+                self.ccodes[index.column()] == 'status':
             ret |= QtCore.Qt.ItemIsUserCheckable
         return ret
 
     def add_action(self, name, priority, comment):
         'adds a new action. Returns its iden'
-        ret = self.dt.add_action(name, priority, comment)
-        self.layoutChanged.emit()
-        return ret
+        return self.dt.add_action(name, priority, comment)
 
     def edit_act(self, index, newval):
         ' (table index, (name, priority, comment)). Set new data to action'
-        i = self.get_iden(index)
-        self.dt.change_action_name(i, newval[0])
-        self.dt.change_action_prior(i, newval[1])
-        self.dt.set_comment(i, newval[2])
+        self.edit_act_by_iden(self.get_iden(index), newval)
 
     def edit_act_by_iden(self, iden, newval):
         ' (task identifier, (name, priority, comment)). Set new data to action'
-        self.dt.change_action_name(iden, newval[0])
-        self.dt.change_action_prior(iden, newval[1])
-        self.dt.set_comment(iden, newval[2])
+        with self.dt.batch():
+            self.dt.change_action_name(iden, newval[0])
+            self.dt.change_action_prior(iden, newval[1])
+            self.dt.set_comment(iden, newval[2])
 
     def finish(self, index):
         self.dt.finish(self.get_iden(index))
-        self.layoutChanged.emit()
 
     def remove(self, index):
         txt = 'Are you sure you want to completely remove '
@@ -175,11 +306,10 @@ class ViewModel(QtCore.QAbstractTableModel):
             txt, QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
         if a == QtWidgets.QMessageBox.Yes:
             self.dt.remove(self.get_iden(index))
-            self.layoutChanged.emit()
 
     def get_act(self, index):
         '->Act. Get action by table index'
-        if index.isValid() and index.row() < len(self.dt.acts):
+        if index.isValid() and index.row() < self._fetched:
             return self.dt.acts[index.row()]
         else:
             None
@@ -194,101 +324,271 @@ class ViewModel(QtCore.QAbstractTableModel):
 
     def timer_view_update(self):
         'update columns which change through time'
-        self.update_column('l24h')
-        self.update_column('l1w')
-        self.update_column('l4w')
-        self.update_column('lses')
-
-    def update_column(self, ccode):
-        'update column by its ccname'
-        col = self.cnames[ccode][0]
-        i0 = self.createIndex(0, col)
-        i1 = self.createIndex(self.rowCount() - 1, col)
-        self.dataChanged.emit(i0, i1)
+        self.refresh(None, self.timed_columns.keys())
+        # schedule next changes of shown rows
+        self._due = []
+        self._scheduled = set()
+        self.region_changed()
+
+    def region_changed(self):
+        'schedule changes of rows which were scrolled into view'
+        now = self.dt.curtime_to_int()
+        for key in self._region()[0] - self._scheduled:
+            self._scheduled.add(key)
+            for c in self.timed_columns:
+                self._schedule(key, c, now)
+        self.timer_updated.emit()
+
+    def next_update(self):
+        '->int or None. Time of the next scheduled cell change'
+        return self._due[0][0] if len(self._due) > 0 else None
+
+    def timer_fire(self):
+        'update cells which were scheduled to change by now'
+        now = self.dt.curtime_to_int()
+        vis_rows = self._region()[0]
+        while len(self._due) > 0 and self._due[0][0] <= now:
+            key, c = heapq.heappop(self._due)[1:]
+            if key >= self._fetched:
+                continue
+            if key not in vis_rows:
+                # will be computed and scheduled when shown
+                self._rows.pop(key, None)
+                self._scheduled.discard(key)
+                self._due = [e for e in self._due if e[1] != key]
+                heapq.heapify(self._due)
+                continue
+            self.refresh([key], [c])
+            self._schedule(key, c, now)
+
+    def _schedule(self, key, ccode, now):
+        'push next change time of a time dependent cell'
+        st = self.dt.stat
+        dur = self.timed_columns[ccode]
+        if key is None:
+            if dur is None:
+                return
+            t = st.next_change('total', None, dur, now)
+        else:
+            iden = self.dt.acts[key].iden
+            if ccode == 'lses':
+                t = st.next_change('lses', iden, None, now)
+            elif ccode == 'l24h':
+                t = st.next_change('real', iden, dur, now)
+            else:
+                if ccode == 'deficit':
+                    dur = tacmaopt.opt.scheduler_window
+                t = min(st.next_change('real', iden, dur, now),
+                        st.next_change('must', iden, dur, now))
+        if t != float('inf'):
+            heapq.heappush(self._due, (t, key, ccode))
 
     def update_row(self, iden):
         'update row by task identifier'
-        iup = -1
-        for i, a in enumerate(self.dt.acts):
+        for i, a in enumerate(self.dt.acts[:self._fetched]):
             if a.iden == iden:
-                iup = i
-                break
-        if iup == -1:
+                self.refresh([i, None])
+                return
+
+    def _tacma_data_changed(self, changes):
+        if changes.fields & set(['all', 'tasks']):
+            # rows were shifted
+            self.beginResetModel()
+            self._rows = {}
+            self._due = []
+            self._scheduled = set()
+            n = self.dt.act_count()
+            if 'all' in changes.fields:
+                self._fetched = min(self.fetch_size, n)
+            elif self._fetched == self._count:
+                self._fetched = n
+            else:
+                self._fetched = min(self._fetched, n)
+            self._count = n
+            self.endResetModel()
+            return
+        if 'finished' in changes.fields:
+            self.refresh()
             return
-        i0 = self.createIndex(iup, 0)
-        i1 = self.createIndex(iup, self.columnCount() - 1)
-        self.dataChanged.emit(i0, i1)
-
-    def _tacma_data_changed(self, event, iden):
-        if event == 'ActiveTaskChanged':
-            self.update_column('status')
-        elif event == 'PriorityChanged':
-            self.update_column('prior')
-        elif event == 'NameChanged':
-            self.update_column('title')
-        elif event == 'ManualDataChanged':
+        # field -> columns which depend on it
+        cols = {'active': ['status', 'idle'],
+                'priority': ['prior', 'weight'],
+                'name': ['title']}
+        ccodes = []
+        for f in changes.fields:
+            ccodes.extend(cols.get(f, []))
+        if ccodes:
+            self.refresh(None, ccodes)
+        for iden in changes.with_field('onoff'):
             self.update_row(iden)
 
 
+class FilterModel(QtCore.QSortFilterProxyModel):
+    """ Sorts ViewModel rows by cached values and filters them
+        by task status, name and recent activity. TOTAL row is always
+        shown at the bottom.
+    """
+    def __init__(self, parent=None):
+        super(FilterModel, self).__init__(parent)
+        self.setSortRole(ViewModel.SortRole)
+        self.setDynamicSortFilter(True)
+        self._alive_only = False
+        self._name = ''
+        # minimum real time within last week in seconds
+        self._min_activity = 0
+
+    def set_alive_only(self, val):
+        self._alive_only = bool(val)
+        self.invalidateFilter()
+
+    def set_name_filter(self, txt):
+        self._name = txt.lower()
+        self.invalidateFilter()
+
+    def set_min_activity(self, sec):
+        self._min_activity = sec
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, row, parent):  # NOQA
+        "overriden"
+        m = self.sourceModel()
+        if row == m.rowCount() - 1:
+            return True
+        if self._alive_only and \
+                m.sort_value(row, 'finished') is not None:
+            return False
+        if self._name and \
+                self._name not in m.sort_value(row, 'title').lower():
+            return False
+        if self._min_activity > 0 and \
+                m.sort_value(row, 'l1w') < self._min_activity:
+            return False
+        return True
+
+    def lessThan(self, left, right):  # NOQA
+        "overriden. Keeps TOTAL row at the bottom"
+        asc = self.sortOrder() == QtCore.Qt.AscendingOrder
+        if left.data(ViewModel.TotalRole):
+            return not asc
+        if right.data(ViewModel.TotalRole):
+            return asc
+        return self.sort_key(left.data(self.sortRole())) < \
+            self.sort_key(right.data(self.sortRole()))
+
+    @staticmethod
+    def sort_key(v):
+        """ -> key of total order on raw cell values.
+            None (e.g. unfinished task) follows any other value since
+            datetime could not be compared to None.
+        """
+        return (v is None, v)
+
+
 class TableDelegate(QtWidgets.QItemDelegate):
     """ delegate for table:
+        formatted cells are painted from QStaticText objects cached by
+        (column code, raw value, TOTAL row flag) key
     """
+    # columns with formatted values
+    formatted = ['created', 'finished', 'l1w', 'l4w', 'lses', 'idle',
+                 'l24h', 'deficit', 'weight']
+    # maximum number of cached texts
+    cache_size = 4096
+
     def __init__(self, dt, parent=None):
         self.dt = dt
         super(TableDelegate, self).__init__(parent)
+        # {(ccode, raw value, total) -> QStaticText or None}
+        # in least recently used order
+        self._cache = OrderedDict()
+        self._margin = QtWidgets.QApplication.style().pixelMetric(
+            QtWidgets.QStyle.PM_FocusFrameHMargin) + 1
+
+    @staticmethod
+    def _text(ccode, d, total):
+        '->str or None. Formatted cell value'
+        if d is None:
+            return None
+        if ccode in ['created', 'finished']:
+            return d.strftime('%Y/%m/%d')
+        if ccode in ['l1w', 'l4w']:
+            if total:
+                return bproc.sec_to_strtime_interval(d, False)
+            hms = bproc.sec_to_strtime_interval(d[1], False)
+            p = int(d[1] / d[0] * 100) if d[0] != 0 else 0
+            return '%s / %i %%' % (hms, p)
+        if ccode in ['lses', 'idle', 'l24h']:
+            return bproc.sec_to_strtime_interval(d, True)
+        if ccode == 'deficit':
+            txt = bproc.sec_to_strtime_interval(abs(d), True)
+            return '-' + txt if d < 0 else txt
+        if ccode == 'weight':
+            return str(int(d * 100)) + '%'
+
+    def _static_text(self, ccode, d, total, font):
+        '->QStaticText or None. Prepared text from cache'
+        key = (ccode, d, total)
+        try:
+            ret = self._cache.pop(key)
+        except KeyError:
+            txt = self._text(ccode, d, total)
+            if txt is None:
+                ret = None
+            else:
+                ret = QtGui.QStaticText(txt)
+                ret.setTextFormat(QtCore.Qt.PlainText)
+                ret.prepare(QtGui.QTransform(), font)
+            if len(self._cache) >= self.cache_size:
+                self._cache.popitem(last=False)
+        self._cache[key] = ret
+        return ret
 
     def paint(self, painter, option, index):
         if not index.isValid():
             return
-        if index.row() >= self.dt.act_count():
+        total = bool(index.data(ViewModel.TotalRole))
+        if total:
             option.font.setBold(True)
-        # if ViewModel._is_column(index, 'idle'):
+        ccode = ViewModel.ccodes[index.column()]
+        # if ccode == 'idle':
         #     option.displayAlignment = QtCore.Qt.AlignRight
-        if ViewModel._is_column(index, 'created', 'finished'):
-            d = index.data()
-            if d is None:
-                return
-            #write date
-            rect = QtCore.QRect(option.rect)
-            self.drawDisplay(painter, option, rect, d.strftime('%Y/%m/%d'))
-            return
-        if ViewModel._is_column(index, 'l1w', 'l4w'):
-            d = index.data()
-            if d is None:
-                return
-            rect = QtCore.QRect(option.rect)
-            if (index.row() == self.dt.act_count()):
-                txt = bproc.sec_to_strtime_interval(d, False)
-            else:
-                hms = bproc.sec_to_strtime_interval(d[1], False)
-                p = int(d[1] / d[0] * 100) if d[0] != 0 else 0
-                txt = '%s / %i %%' % (hms, p)
-            self.drawDisplay(painter, option, rect, txt)
+        if ccode not in self.formatted:
+            super(TableDelegate, self).paint(painter, option, index)
             return
-        if ViewModel._is_column(index, 'lses', 'idle', 'l24h'):
-            d = index.data()
-            if d is not None:
-                txt = bproc.sec_to_strtime_interval(d, True)
-                rect = QtCore.QRect(option.rect)
-                self.drawDisplay(painter, option, rect, txt)
+        st = self._static_text(ccode, index.data(), total, option.font)
+        if st is None:
             return
-        if ViewModel._is_column(index, 'weight'):
-            d = index.data()
-            if d is not None:
-                txt = str(int(index.data() * 100)) + '%'
-                rect = QtCore.QRect(option.rect)
-                self.drawDisplay(painter, option, rect, txt)
+        rect = QtCore.QRect(option.rect)
+        sz = st.size()
+        if sz.width() + 2 * self._margin > rect.width():
+            # needs elision
+            self.drawDisplay(painter, option, rect, st.text())
             return
-
-        super(TableDelegate, self).paint(painter, option, index)
+        painter.save()
+        if option.state & QtWidgets.QStyle.State_Selected:
+            painter.fillRect(rect, option.palette.highlight())
+            painter.setPen(option.palette.highlightedText().color())
+        else:
+            painter.setPen(option.palette.text().color())
+        painter.setFont(option.font)
+        painter.drawStaticText(QtCore.QPointF(
+            rect.left() + self._margin,
+            rect.top() + (rect.height() - sz.height()) / 2.0), st)
+        painter.restore()
 
 
 class MainWindowTable(QtWidgets.QTableView):
     def __init__(self, dt, parent):
         super(MainWindowTable, self).__init__(parent)
 
-        # model and delegate
-        self.setModel(ViewModel(dt))
+        # model, sort/filter proxy and delegate
+        self.vmodel = ViewModel(dt)
+        self.fmodel = FilterModel(self)
+        self.fmodel.setSourceModel(self.vmodel)
+        self.setModel(self.fmodel)
+        # insertion order until a header is clicked
+        self.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.setSortingEnabled(True)
         delegate = TableDelegate(dt, self)
         self.setItemDelegate(delegate)
 
@@ -296,10 +596,11 @@ class MainWindowTable(QtWidgets.QTableView):
         self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self._context_menu)
 
-        #autoupdate table
+        #autoupdate table at the moments when displayed values change
         self.view_update = QtCore.QTimer(self)
-        self.view_update.timeout.connect(self.model().timer_view_update)
-        self.view_update.start(tacmaopt.opt.update_interval * 1000)
+        self.view_update.setSingleShot(True)
+        self.view_update.timeout.connect(self._timer_fire)
+        self.vmodel.timer_updated.connect(self._timer_arm)
 
         #column widths
         for k, v in tacmaopt.opt.colwidths.iteritems():
@@ -314,9 +615,77 @@ class MainWindowTable(QtWidgets.QTableView):
         # header after setting widths
         self.horizontalHeader().sectionResized.connect(self._secresized)
 
+        # only shown cells are refreshed
+        self.vmodel.region = self._region
+        self.verticalScrollBar().valueChanged.connect(self._region_changed)
+        self.horizontalScrollBar().valueChanged.connect(self._region_changed)
+        self.fmodel.layoutChanged.connect(self._region_changed)
+        self.fmodel.rowsInserted.connect(self._region_changed)
+        self.fmodel.rowsRemoved.connect(self._region_changed)
+
+    def showEvent(self, event):  # NOQA
+        'refresh time dependent cells which were not updated while hidden'
+        super(MainWindowTable, self).showEvent(event)
+        self.vmodel.timer_view_update()
+
+    def hideEvent(self, event):  # NOQA
+        'stop updates of invisible table'
+        super(MainWindowTable, self).hideEvent(event)
+        self.view_update.stop()
+
+    def resizeEvent(self, event):  # NOQA
+        super(MainWindowTable, self).resizeEvent(event)
+        self._region_changed()
+
+    def _region(self):
+        '-> (ViewModel rows, column codes) shown in the viewport'
+        vp = self.viewport().rect()
+        rows = []
+        r0 = self.rowAt(vp.top())
+        if r0 >= 0:
+            r1 = self.rowAt(vp.bottom())
+            if r1 < 0:
+                r1 = self.fmodel.rowCount() - 1
+            for r in range(r0, r1 + 1):
+                rows.append(self._src(self.fmodel.index(r, 0)).row())
+        ccodes = []
+        c0 = self.columnAt(vp.left())
+        if c0 >= 0:
+            c1 = self.columnAt(vp.right())
+            if c1 < 0:
+                c1 = self.fmodel.columnCount() - 1
+            for c in range(c0, c1 + 1):
+                if not self.isColumnHidden(c):
+                    ccodes.append(ViewModel.ccodes[c])
+        return rows, ccodes
+
+    def _region_changed(self, *args):
+        if self.isVisible():
+            self.vmodel.region_changed()
+
+    def _timer_fire(self):
+        self.vmodel.timer_fire()
+        self._timer_arm()
+
+    def _timer_arm(self):
+        'start timer to fire at the next cell change'
+        self.view_update.stop()
+        t = self.vmodel.next_update()
+        if t is None or not self.isVisible():
+            return
+        dt = self.vmodel.dt.int_to_time(t) - datetime.utcnow()
+        msec = int(dt.total_seconds() * 1000) + 1
+        # update_interval bounds refresh rate
+        msec = max(msec, tacmaopt.opt.update_interval * 1000)
+        self.view_update.start(msec)
+
+    def _src(self, index):
+        '->ViewModel index by view index'
+        return self.fmodel.mapToSource(index)
+
     def mouseDoubleClickEvent(self, event):  # NOQA
         if event.button() == QtCore.Qt.LeftButton:
-            self._edit_action(self.indexAt(event.pos()))
+            self._edit_action(self._src(self.indexAt(event.pos())))
 
     def _secresized(self, index, oldval, newval):
         if newval < 10:
@@ -327,7 +696,7 @@ class MainWindowTable(QtWidgets.QTableView):
                 return
 
     def _context_menu(self, pnt):
-        index = self.indexAt(pnt)
+        index = self._src(self.indexAt(pnt))
 
         menu = QtWidgets.QMenu(self)
         #Edit
@@ -342,7 +711,7 @@ class MainWindowTable(QtWidgets.QTableView):
         #Finish
         act = QtWidgets.QAction("Finish", self)
         act.setEnabled(index.isValid() and
-                       self.model().get_act(index).is_alive())
+                       self.vmodel.get_act(index).is_alive())
         act.triggered.connect(
             functools.partial(self._fin_action, index))
         menu.addAction(act)
@@ -363,28 +732,31 @@ class MainWindowTable(QtWidgets.QTableView):
     def _add_action(self):
         def applyfunc(name, prior, comm):
             if self.__tmp is None:
-                self.__tmp = self.model().add_action(name, prior, comm)
+                self.__tmp = self.vmodel.add_action(name, prior, comm)
             else:
-                self.model().edit_act_by_iden(
+                self.vmodel.edit_act_by_iden(
                     self.__tmp, (name, prior, comm))
 
+        from addeditwid import AddEditDialog
         self.__tmp = None
         AddEditDialog(applyfunc, None, self).exec_()
 
     def _edit_action(self, index):
         def applyfunc(name, prior, comm):
-            self.model().edit_act(index, (name, prior, comm))
+            self.vmodel.edit_act(index, (name, prior, comm))
 
-        a = self.model().get_act(index)
+        from addeditwid import AddEditDialog
+        a = self.vmodel.get_act(index)
         if a is not None:
             AddEditDialog(applyfunc, a, self).exec_()
 
     def _mod_action(self, index):
-        a = self.model().get_act(index)
-        ManualModifyDialog(self.model().dt, a, self).exec_()
+        from manmodwid import ManualModifyDialog
+        a = self.vmodel.get_act(index)
+        ManualModifyDialog(self.vmodel.dt, a, self).exec_()
 
     def _fin_action(self, index):
-        self.model().finish(index)
+        self.vmodel.finish(index)
 
     def _rem_action(self, index):
-        self.model().remove(index)
+        self.vmodel.remove(index)
@@ -0,0 +1,59 @@
+from PyQt5 import QtWidgets, QtCore
+
+
+class QuickSwitchDialog(QtWidgets.QDialog):
+    """ Popup with incremental task search.
+        Enter turns on the selected task, Escape closes the popup.
+    """
+    def __init__(self, dt, parent=None):
+        super(QuickSwitchDialog, self).__init__(parent)
+        self.dt = dt
+        self.setWindowTitle('Quick switch')
+        self.setWindowFlags(self.windowFlags() | QtCore.Qt.Popup)
+        self.resize(400, 300)
+        self.edit = QtWidgets.QLineEdit(self)
+        self.edit.setPlaceholderText('Task name or comment')
+        self.edit.textChanged.connect(self.fill)
+        self.edit.returnPressed.connect(self.accept)
+        self.edit.installEventFilter(self)
+        self.lst = QtWidgets.QListWidget(self)
+        self.lst.itemActivated.connect(self.accept)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.edit)
+        layout.addWidget(self.lst)
+        self.setLayout(layout)
+
+    def showEvent(self, event):  # NOQA
+        self.edit.clear()
+        self.fill('')
+        self.edit.setFocus()
+        super(QuickSwitchDialog, self).showEvent(event)
+
+    def eventFilter(self, obj, event):  # NOQA
+        'up/down keys in search field move list selection'
+        if event.type() == QtCore.QEvent.KeyPress and \
+                event.key() in [QtCore.Qt.Key_Up, QtCore.Qt.Key_Down]:
+            d = -1 if event.key() == QtCore.Qt.Key_Up else 1
+            r = self.lst.currentRow() + d
+            if 0 <= r < self.lst.count():
+                self.lst.setCurrentRow(r)
+            return True
+        return super(QuickSwitchDialog, self).eventFilter(obj, event)
+
+    def fill(self, txt):
+        'fills list with tasks matching txt'
+        self.lst.clear()
+        active = self.dt.active_task()
+        for iden in self.dt.search.search(txt):
+            name = self.dt.name(iden)
+            if iden == active:
+                name += ' (running)'
+            it = QtWidgets.QListWidgetItem(name, self.lst)
+            it.setData(QtCore.Qt.UserRole, iden)
+        self.lst.setCurrentRow(0)
+
+    def accept(self):
+        it = self.lst.currentItem()
+        if it is not None:
+            self.dt.turn_on(it.data(QtCore.Qt.UserRole))
+        super(QuickSwitchDialog, self).accept()
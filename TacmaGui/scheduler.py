@@ -0,0 +1,36 @@
+import heapq
+import tacmaopt
+
+
+class TaskScheduler(object):
+    """ Ranks alive tasks by their deficit: must time minus
+        real time within last opt.scheduler_window seconds.
+        Deficits of all tasks drift while any task is running and
+        renormalize at each priority change, so they are not stored:
+        a deficit is evaluated in O(1) from statistics rolling windows
+        and top(k) evaluates all alive tasks in O(n log k).
+    """
+    def __init__(self, dt):
+        ' dt - TacmaData object'
+        self._dt = dt
+
+    def deficit(self, iden):
+        '->float or None. Current deficit of a task. None if it is finished'
+        try:
+            a = self._dt._gai(iden)
+        except:
+            return None
+        return self._eval(iden) if a.is_alive() else None
+
+    def top(self, k):
+        '->[(iden, deficit)]. k alive tasks with largest deficits'
+        return heapq.nlargest(
+            k, ((a.iden, self._eval(a.iden))
+                for a in self._dt.acts if a.is_alive()),
+            key=lambda x: x[1])
+
+    def _eval(self, iden):
+        '->float. Computes deficit of a task'
+        w = tacmaopt.opt.scheduler_window
+        st = self._dt.stat
+        return st.must_time(iden, w) - st.real_time(iden, w)
@@ -1,31 +1,128 @@
 #!/usr/bin/env python
 
 import sys
-from PyQt5 import QtWidgets
+import time
+import threading
+import functools
+from PyQt5 import QtWidgets, QtCore
 import tacmaopt
-import mainwinwid
 
 
-def main():
+class StartupTiming(object):
+    'Durations of startup phases printed if --timing flag is given'
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self._start = self._last = time.time()
+        # [(phase name, seconds)]
+        self.phases = []
+        self._reported = False
+
+    def phase(self, name):
+        'finishes startup phase with the given name'
+        t = time.time()
+        self.phases.append((name, t - self._last))
+        self._last = t
+
+    def report(self):
+        'prints phase durations once'
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        print 'Startup timing:'
+        for name, t in self.phases:
+            print '  %-16s %7.3f s' % (name, t)
+        print '  %-16s %7.3f s' % ('total', self._last - self._start)
+
+
+class LoaderError(Exception):
+    pass
+
+
+class LoaderUI(object):
+    """ wfile.DataUI of the loading thread. Data which needs
+        a user dialog is not loaded there
+    """
+    def info(self, txt):
+        print txt
+
+    def warning(self, txt):
+        raise LoaderError(txt)
+
+    def confirm(self, txt):
+        raise LoaderError(txt)
+
+
+class DataLoader(QtCore.QObject):
+    """ Reads data file and builds TacmaData in a background thread.
+        loaded signal is emitted when reading is finished.
+    """
+    loaded = QtCore.pyqtSignal()
+
+    def __init__(self, fname):
+        super(DataLoader, self).__init__()
+        self.fname = fname
+        # wfile.TacmaData or None if reading failed
+        self.data = None
+
+    def start(self):
+        th = threading.Thread(target=self._run, name='TacmaLoad')
+        th.daemon = True
+        th.start()
+
+    def _run(self):
+        try:
+            import wfile
+            self.data = wfile.TacmaData(self.fname, threaded_stat=True,
+                                        ui=LoaderUI())
+        except:
+            # errors are reported by TacmaData built by the main window
+            pass
+        self.loaded.emit()
+
+
+def _data_loaded(loader, ticon, timing):
+    'builds main window after data file was read'
+    timing.phase('read data')
+    import mainwinwid
+    import wfile
+    timing.phase('import widgets')
     try:
-        # config.py will be copied to actual directory
-        # only during installation procedure.
-        # If there is no such module -> we are in the debug session
-        import config
-        import os.path
-        tacmaopt.ProgOptions.wdir = config.working_directory
-        tacmaopt.ProgOptions.ver = config.version
-        if not os.path.exists(tacmaopt.ProgOptions.wdir):
-            os.makedirs(tacmaopt.ProgOptions.wdir)
-    except:
-        tacmaopt.ProgOptions.wdir = '.'
-        tacmaopt.ProgOptions.ver = 'Debug'
+        mw = mainwinwid.MainWindow(loader.fname, ticon, loader.data)
+    except wfile.DataError as e:
+        print >> sys.stderr, str(e)
+        QtWidgets.qApp.exit(1)
+        return
+    mw.show()
+    timing.phase('main window')
+    if timing.enabled:
+        def stat_ready():
+            timing.phase('statistics')
+            timing.report()
+        mw.data.stat.subscribe_ready(stat_ready)
+        if mw.data.stat.version > 0:
+            stat_ready()
+    # keep main window alive
+    loader.mw = mw
+
+
+def main():
+    timing = StartupTiming('--timing' in sys.argv)
+    tacmaopt.init_wdir()
 
     # -- read options
     tacmaopt.opt.read()
+    timing.phase('options')
 
-    mw = mainwinwid.MainWindow(tacmaopt.opt.wfile)
-    mw.show()
+    # -- tray icon is shown while data is loading
+    from traywid import TrayIcon
+    ticon = TrayIcon()
+    ticon.show()
+    timing.phase('tray icon')
+
+    loader = DataLoader(tacmaopt.opt.wfile)
+    loader.loaded.connect(
+        functools.partial(_data_loaded, loader, ticon, timing))
+    loader.start()
 
     # start gui loop
     sys.exit(QtWidgets.qApp.exec_())
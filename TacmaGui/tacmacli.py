@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+""" Console interface to tacma data. Does not import Qt so it could be
+    bound to window manager hotkeys and used in shell scripts.
+    Running gui reloads data file after it was changed from here.
+"""
+import sys
+import argparse
+import tacmaopt
+
+
+class CliError(Exception):
+    pass
+
+
+class CliUI(object):
+    """ DataUI which writes messages to stderr.
+        Blank data is started only if init is set
+    """
+    def __init__(self, verbose, init=False):
+        self.verbose = verbose
+        self.init = init
+
+    def info(self, txt):
+        if self.verbose:
+            print >> sys.stderr, txt
+
+    def warning(self, txt):
+        print >> sys.stderr, txt
+
+    def confirm(self, txt):
+        if not self.init:
+            print >> sys.stderr, txt
+        return self.init
+
+
+def find_task(dt, txt, alive=True):
+    """ ->int. Identifier of task given by identifier, name or
+        search words. Raises CliError if nothing was found
+    """
+    acts = [a for a in dt.acts if a.is_alive() or not alive]
+    try:
+        iden = int(txt)
+        if any(a.iden == iden for a in acts):
+            return iden
+    except ValueError:
+        pass
+    for a in acts:
+        if a.name.lower() == txt.lower():
+            return a.iden
+    if alive:
+        found = dt.search.search(txt, 1)
+        if len(found) > 0:
+            return found[0]
+    raise CliError('Task "%s" was not found' % txt)
+
+
+def _task_line(dt, iden):
+    '->str. Task description for lists'
+    mark = '*' if dt.is_on(iden) else ' '
+    return '%s %4i  %-40s %6.2f' % (mark, iden, dt.name(iden),
+                                    dt.priority(iden))
+
+
+def cmd_start(dt, args):
+    iden = find_task(dt, args.task)
+    dt.turn_on(iden)
+    print 'Started: %s' % dt.name(iden)
+
+
+def cmd_stop(dt, args):
+    iden = dt.active_task()
+    if iden is None:
+        print 'No active task'
+        return
+    dt.turn_off()
+    print 'Stopped: %s' % dt.name(iden)
+
+
+def cmd_switch(dt, args):
+    if args.task is not None:
+        iden = find_task(dt, args.task)
+    else:
+        # previous task
+        lc = dt.last_closed_session()
+        if lc is None or not dt._gai(lc[0]).is_alive():
+            raise CliError('No previous task')
+        iden = lc[0]
+        if iden == dt.active_task():
+            raise CliError('Previous task is already active')
+    dt.turn_on(iden)
+    print 'Started: %s' % dt.name(iden)
+
+
+def cmd_add(dt, args):
+    for a in dt.acts:
+        if a.is_alive() and a.name.lower() == args.name.lower():
+            raise CliError('Task "%s" already exists' % a.name)
+    iden = dt.add_action(args.name, args.priority, args.comment)
+    print 'Added: %i %s' % (iden, args.name)
+
+
+def cmd_finish(dt, args):
+    iden = find_task(dt, args.task)
+    dt.finish(iden)
+    print 'Finished: %s' % dt.name(iden)
+
+
+def cmd_report(dt, args):
+    import bproc
+    t1 = dt.curtime_to_int()
+    t0 = max(0, t1 - int(args.days * 86400))
+    rep = dt.stat.report(t0, t1)
+    rep = sorted(rep.iteritems(), key=lambda x: -x[1][0])
+    total = 0
+    for iden, (worked, must) in rep:
+        if worked == 0 and (must == 0 or not dt._gai(iden).is_alive()):
+            continue
+        total += worked
+        print '%-40s %10s %10s' % (
+            dt.name(iden),
+            bproc.sec_to_strtime_interval(worked),
+            bproc.sec_to_strtime_interval(must))
+    print '%-40s %10s' % ('Total', bproc.sec_to_strtime_interval(total))
+
+
+def cmd_list(dt, args):
+    for a in dt.acts:
+        if args.all or a.is_alive():
+            print _task_line(dt, a.iden)
+
+
+def cmd_status(dt, args):
+    iden = dt.active_task()
+    if iden is None:
+        print 'No active task'
+        return
+    import bproc
+    a = dt._gai(iden)
+    d = dt.curtime_to_int() - a.onoff[-1]
+    print '%s %s' % (dt.name(iden), bproc.sec_to_strtime_interval(d))
+
+
+def build_parser():
+    '->argparse.ArgumentParser'
+    p = argparse.ArgumentParser(
+        prog='tacma-cli', description='Console interface to tacma data')
+    p.add_argument('-f', '--file', help='data file')
+    p.add_argument('-v', '--verbose', action='store_true',
+                   help='print data reading messages')
+    p.add_argument('--init', action='store_true',
+                   help='start blank data file if data could not be read')
+    sub = p.add_subparsers(title='commands')
+
+    s = sub.add_parser('start', help='start task')
+    s.add_argument('task', help='identifier, name or search words')
+    s.set_defaults(func=cmd_start)
+
+    s = sub.add_parser('stop', help='stop active task')
+    s.set_defaults(func=cmd_stop)
+
+    s = sub.add_parser('switch',
+                       help='start task or return to the previous one')
+    s.add_argument('task', nargs='?', help='identifier, name or search words')
+    s.set_defaults(func=cmd_switch)
+
+    s = sub.add_parser('add', help='add new task')
+    s.add_argument('name')
+    s.add_argument('-p', '--priority', type=float, default=1.0)
+    s.add_argument('-c', '--comment', default='')
+    s.set_defaults(func=cmd_add)
+
+    s = sub.add_parser('finish', help='finish task')
+    s.add_argument('task', help='identifier, name or search words')
+    s.set_defaults(func=cmd_finish)
+
+    s = sub.add_parser('report', help='worked and must time of tasks')
+    s.add_argument('-d', '--days', type=float, default=1.0,
+                   help='report interval in days before now')
+    s.set_defaults(func=cmd_report)
+
+    s = sub.add_parser('list', help='list tasks')
+    s.add_argument('-a', '--all', action='store_true',
+                   help='include finished tasks')
+    s.set_defaults(func=cmd_list)
+
+    s = sub.add_parser('status', help='print active task')
+    s.set_defaults(func=cmd_status)
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    tacmaopt.init_wdir()
+    tacmaopt.opt.read()
+    fn = args.file if args.file is not None else tacmaopt.opt.wfile
+
+    import wfile
+    try:
+        dt = wfile.TacmaData(fn, ui=CliUI(args.verbose, args.init),
+                             lazy_stat=True, keep_running=True)
+    except wfile.DataError as e:
+        print >> sys.stderr, str(e)
+        print >> sys.stderr, 'Use --init to start blank data file'
+        return 1
+    if dt.file_hash is None:
+        # blank data was started
+        dt.write_data()
+    try:
+        args.func(dt, args)
+    except CliError as e:
+        print >> sys.stderr, str(e)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import sys
 import xml.etree.ElementTree as ET
 import os.path
 import bproc
@@ -36,6 +37,16 @@ class ProgOptions(object):
         self.archivate = 20
         #minimum number of weeks in actual file
         self.minactual = 5
+        #rolling windows (in seconds) with incrementally updated statistics
+        self.rolling_windows = [86400, 604800, 2419200]
+        #statistics cache: time granularity in seconds and maximum size
+        self.stat_cache_quantum = 1
+        self.stat_cache_size = 4096
+        #statistics saved between program runs
+        self.stat_snapshot_fn = 'tacmaStat.cache'
+        #deficit window (in seconds) and number of tasks to suggest
+        self.scheduler_window = 604800
+        self.scheduler_topk = 3
 
     def title(self):
         return 'Tacma v.' + self.ver
@@ -48,6 +59,8 @@ class ProgOptions(object):
         self.opt_fn = self._towd(os.path.basename(self.opt_fn))
         self.wfile = self._towd(os.path.basename(self.wfile))
         self.backup_fn = self._towd(os.path.basename(self.backup_fn))
+        self.stat_snapshot_fn = self._towd(
+            os.path.basename(self.stat_snapshot_fn))
 
     def new_archive_filename(self):
         index = 1
@@ -103,11 +116,19 @@ class ProgOptions(object):
         ET.SubElement(root, 'UPDATE_INT').text = str(self.update_interval)
         ET.SubElement(root, 'ARCHIVATE').text = str(self.archivate)
         ET.SubElement(root, 'MINACTUAL').text = str(self.minactual)
+        ET.SubElement(root, 'ROLLING_WINDOWS').text = \
+            ' '.join(map(str, self.rolling_windows))
+        ET.SubElement(root, 'STAT_CACHE_QUANTUM').text = \
+            str(self.stat_cache_quantum)
+        ET.SubElement(root, 'STAT_CACHE_SIZE').text = \
+            str(self.stat_cache_size)
+        ET.SubElement(root, 'SCHEDULER_WINDOW').text = \
+            str(self.scheduler_window)
+        ET.SubElement(root, 'SCHEDULER_TOPK').text = str(self.scheduler_topk)
 
         bproc.xmlindent(root)
         tree = ET.ElementTree(root)
         tree.write(self.opt_fn, xml_declaration=True, encoding='utf-8')
-        print "written"
 
     def read(self):
         'tries to read data from default location'
@@ -115,7 +136,8 @@ class ProgOptions(object):
         try:
             root = ET.parse(self.opt_fn)
         except Exception as e:
-            print 'Error loading options file: %s' % str(e)
+            # stdout could be parsed by tacma-cli callers
+            print >> sys.stderr, 'Error loading options file: %s' % str(e)
 
         try:
             self.wfile = self._towd(root.find('ADATAFILE').text)
@@ -182,5 +204,44 @@ class ProgOptions(object):
             self.update_interval = int(root.find('UPDATE_INT').text)
         except:
             pass
+        try:
+            self.rolling_windows = map(
+                int, root.find('ROLLING_WINDOWS').text.split())
+        except:
+            pass
+        try:
+            self.stat_cache_quantum = int(
+                root.find('STAT_CACHE_QUANTUM').text)
+        except:
+            pass
+        try:
+            self.stat_cache_size = int(root.find('STAT_CACHE_SIZE').text)
+        except:
+            pass
+        try:
+            self.scheduler_window = int(root.find('SCHEDULER_WINDOW').text)
+        except:
+            pass
+        try:
+            self.scheduler_topk = int(root.find('SCHEDULER_TOPK').text)
+        except:
+            pass
+
+
+def init_wdir():
+    """ sets working directory and version of ProgOptions.
+        config.py will be copied to actual directory
+        only during installation procedure.
+        If there is no such module -> we are in the debug session
+    """
+    try:
+        import config
+        ProgOptions.wdir = config.working_directory
+        ProgOptions.ver = config.version
+        if not os.path.exists(ProgOptions.wdir):
+            os.makedirs(ProgOptions.wdir)
+    except:
+        ProgOptions.wdir = '.'
+        ProgOptions.ver = 'Debug'
 
 opt = ProgOptions()
@@ -1,39 +1,399 @@
+import copy
+import csv
+import os.path
+import cPickle
+import threading
+import traceback
+import Queue
+from array import array
+from collections import OrderedDict
 import bproc
+import tacmaopt
+
+# Format version of saved StatSnapshot data. Should be increased
+# on any change of StatSnapshot data sets or PieceWiseFun layout
+snapshot_format = 1
+
+
+class RollingWindow(object):
+    """ Running integrals of piecewise functions within [tm - dur, tm]
+        time interval. Moving window end forward adds newly covered slice
+        and subtracts expired one so the cost of advance does not depend
+        on history length.
+    """
+    def __init__(self, dur):
+        ' dur - window length in seconds'
+        self.dur = dur
+        self.reset()
+
+    def reset(self):
+        ' forget all accumulated values'
+        # end time of the window. None if values were not computed
+        self.tm = None
+        # {key -> float}. Integral values
+        self._vals = {}
+        # {key -> [int, int]}. Section indicies of leading and trailing
+        # window edges
+        self._curs = {}
+
+    def advance(self, funs, tm):
+        """ Moves window end to tm.
+            funs -- {key -> PieceWiseFun}
+        """
+        if self.tm == tm:
+            return
+        if self.tm is None or tm < self.tm or tm - self.tm >= self.dur:
+            # full recomputation
+            t0 = max(0, tm - self.dur)
+            for k, f in funs.iteritems():
+                i0 = f.section_index(t0)
+                v = f.integral_from(i0, t0, tm)[0]
+                self._vals[k] = v
+                self._curs[k] = [f.section_index(tm), i0]
+        else:
+            # add [self.tm, tm], subtract [old t0, new t0]
+            old0 = max(0, self.tm - self.dur)
+            new0 = max(0, tm - self.dur)
+            for k, f in funs.iteritems():
+                c = self._curs[k]
+                add, c[0] = f.integral_from(c[0], self.tm, tm)
+                sub, c[1] = f.integral_from(c[1], old0, new0)
+                self._vals[k] += add - sub
+        self.tm = tm
+
+    def value(self, key):
+        '->float. Integral of function given by key'
+        return self._vals[key]
+
+
+class DayCube(object):
+    """ Worked and must seconds of each task for each whole utc day.
+        Day i covers [i*86400 - offset, (i+1)*86400 - offset) interval
+        where offset is a time of data start date passed since midnight.
+        Only days which are already over are stored.
+    """
+    def __init__(self):
+        self.reset(0)
+
+    def reset(self, offset):
+        ' forget all computed days'
+        self.offset = offset
+        # number of computed days
+        self.ndays = 0
+        # {iden -> array of floats}. Worked and must seconds by days
+        self.work = {}
+        self.must = {}
+        # set of day indicies which should be recomputed
+        self._stale = set()
+
+    def day_index(self, t):
+        '->int. Index of a day containing t'
+        return int((t + self.offset) // 86400)
+
+    def day_start(self, i):
+        '->int. Starting time of i-th day'
+        return i * 86400 - self.offset
+
+    def touch(self, t0, t1):
+        ' marks computed days intersecting [t0, t1] as stale'
+        d1 = self.ndays if t1 is None else \
+            min(self.ndays, self.day_index(t1) + 1)
+        self._stale.update(range(max(0, self.day_index(t0)), d1))
+
+    def actualize(self, funs, tm):
+        """ Computes stale days and days which are over before tm.
+            funs -- [(iden, worked PieceWiseFun, must PieceWiseFun)]
+        """
+        nd = max(self.ndays, self.day_index(tm))
+        for d in self._stale:
+            t0, t1 = self.day_start(d), self.day_start(d + 1)
+            for iden, fw, fm in funs:
+                if iden in self.work:
+                    self.work[iden][d] = fw.integral_from(
+                        fw.section_index(t0), t0, t1)[0]
+                    self.must[iden][d] = fm.integral_from(
+                        fm.section_index(t0), t0, t1)[0]
+        self._stale.clear()
+        for iden, fw, fm in funs:
+            if iden not in self.work:
+                self.work[iden] = self._sweep(fw, 0, nd)
+                self.must[iden] = self._sweep(fm, 0, nd)
+            elif nd > self.ndays:
+                self.work[iden].extend(self._sweep(fw, self.ndays, nd))
+                self.must[iden].extend(self._sweep(fm, self.ndays, nd))
+        self.ndays = nd
+
+    def _sweep(self, f, d0, d1):
+        '->array. Integrals of f within days [d0, d1)'
+        ret = array('d')
+        t0 = self.day_start(d0)
+        i = f.section_index(t0)
+        for d in range(d0, d1):
+            t1 = self.day_start(d + 1)
+            v, i = f.integral_from(i, t0, t1)
+            ret.append(v)
+            t0 = t1
+        return ret
+
+
+class StatSnapshot(object):
+    """ Statistic data sets computed from a copy of task data.
+        Snapshot is never modified after creation so it could be built in
+        one thread and read from another.
+    """
+    def __init__(self, version, acts, key=None):
+        """ version -- data version this snapshot was built from
+            acts -- [(iden, priority PieceWiseFun, onoff PieceWiseFun)]
+            key -- fingerprint of task data (see TacmaStat._fingerprint)
+        """
+        self.version = version
+        self.key = key
+        # pickled data sets written by self.dump() or None
+        self._body = None
+
+        # {identifier -> PieceWiseFunc} Activity of a task
+        self.onoff = {a[0]: a[2] for a in acts}
+
+        # PieceWiseFun. Total working activity. Equals 1 if any task was
+        # active
+        self.working_activity = bproc.PieceWiseFun()
+
+        # {identifier -> PieceWiseFunc} Represents weigth [0, 1] of a task
+        # on a time line
+        self.weights = {}
+
+        # {identifier -> PieceWiseFunc} Represents weigth [0, 1] of a task
+        # multiplied by total working activity
+        self.working_portion = {}
+
+        if len(acts) > 0:
+            self._build(acts)
+
+    def dump(self, fobj, file_hash, tm):
+        """ saves data sets to a binary file object.
+            file_hash -- content hash of data file the snapshot belongs to,
+            tm -- save time of the data file
+            Data sets are pickled once, next dumps only change the header.
+        """
+        if self._body is None:
+            self._body = cPickle.dumps(
+                (self.onoff, self.working_activity, self.weights,
+                 self.working_portion), 2)
+        cPickle.dump((snapshot_format, file_hash, tm), fobj, 2)
+        fobj.write(self._body)
+
+    @classmethod
+    def load(cls, fobj, file_hash, version, key=None):
+        """ -> StatSnapshot or None.
+            Loads data sets saved by dump() for the data file with given
+            content hash. Activity after the save time is dropped since
+            a running task is stopped at that moment on data reading.
+        """
+        fmt, h, tm = cPickle.load(fobj)
+        if fmt != snapshot_format or h != file_hash:
+            return None
+        ret = cls(version, [], key)
+        (ret.onoff, ret.working_activity, ret.weights,
+         ret.working_portion) = cPickle.load(fobj)
+        funs = [ret.working_activity] + ret.onoff.values() +\
+            ret.working_portion.values()
+        for f in funs:
+            # cut sections in place. Only the last ones could pass tm
+            while len(f._dt) > 0 and f._dt[-1][0] >= tm:
+                f._dt.pop()
+            if len(f._dt) > 0 and f._dt[-1][1] > tm:
+                f._dt[-1] = (f._dt[-1][0], float(tm), f._dt[-1][2])
+        return ret
+
+    def _build(self, acts):
+        ' computes working_activity, weights, working portion'
+        # 1. weights
+        # Global stencil of non normalised priorities: (breakpoints x tasks)
+        # matrix stored as columns which start at task creation
+        bps, cols = bproc.PieceWiseFun.stencil([a[1] for a in acts])
+        # Sum of all priorities on each stencil interval
+        sums = array('d', [0]) * max(0, len(bps) - 1)
+        for i0, col in cols:
+            for k, v in enumerate(col):
+                sums[i0 + k] += v
+        # Normalize priorities to get weights
+        for a, (i0, col) in zip(acts, cols):
+            w = array('d', [v / sums[i0 + k] if v != 0 else 0
+                            for k, v in enumerate(col)])
+            self.weights[a[0]] = bproc.PieceWiseFun.from_stencil(bps, i0, w)
+
+        # 2. total working activity
+        # place 1 if any activity is 1
+        self.working_activity = bproc.PieceWiseFun.union(
+            [a[2] for a in acts])
+
+        # 3. working portion = weights * working_activity
+        self.working_portion = {a[0]: bproc.PieceWiseFun.product(
+            self.weights[a[0]], self.working_activity) for a in acts}
+
+
+class StatWorker(object):
+    """ Background thread which builds StatSnapshot objects.
+        Only the latest of queued requests is computed.
+    """
+    def __init__(self, publish):
+        ' publish -- (StatSnapshot) -> None. Called from worker thread'
+        self._publish = publish
+        self._queue = Queue.Queue()
+        th = threading.Thread(target=self._run, name='TacmaStat')
+        th.daemon = True
+        th.start()
+
+    def submit(self, version, acts, key=None):
+        ' queues snapshot computation'
+        self._queue.put((version, acts, key))
+
+    def _run(self):
+        while True:
+            req = self._queue.get()
+            try:
+                while True:
+                    req = self._queue.get_nowait()
+            except Queue.Empty:
+                pass
+            try:
+                self._publish(StatSnapshot(*req))
+            except:
+                traceback.print_exc()
+
+
+def write_series_csv(fobj, dt, series):
+    """ writes TacmaStat.series output to a csv file object
+        using dt (TacmaData) for time conversion
+    """
+    w = csv.writer(fobj)
+    w.writerow(['start', 'end', 'worked', 'must'])
+    for b0, b1, worked, must in series:
+        w.writerow([dt.int_to_time(b0).strftime('%Y-%m-%d %H:%M:%S'),
+                    dt.int_to_time(b1).strftime('%Y-%m-%d %H:%M:%S'),
+                    int(round(worked)), int(round(must))])
+
+
+def fold_week(intervals, phase, bins, init=None):
+    """ -> array('d') of 7 * 24 * bins values.
+    Sums lengths of [(t0, t1)] intervals within hour of week buckets.
+    Intervals are split exactly at bucket boundaries; whole weeks are
+    added to all buckets at once. phase -- shift of zero time from
+    the previous week start. init -- initial values (not modified).
+    """
+    n = 7 * 24 * bins
+    ln = 3600.0 / bins
+    ret = array('d', [0]) * n if init is None else array('d', init)
+    # number of full bucket passes over a week
+    passes = 0
+    for t0, t1 in intervals:
+        x0, x1 = (t0 + phase) / ln, (t1 + phase) / ln
+        k0, k1 = int(x0), int(x1)
+        if k0 == k1:
+            ret[k0 % n] += (x1 - x0) * ln
+            continue
+        ret[k0 % n] += (k0 + 1 - x0) * ln
+        ret[k1 % n] += (x1 - k1) * ln
+        # whole buckets within (k0, k1)
+        m = k1 - k0 - 1
+        passes += m // n
+        for k in range(k0 + 1, k0 + 1 + m % n):
+            ret[k % n] += ln
+    if passes > 0:
+        for k in range(n):
+            ret[k] += passes * ln
+    return ret
 
 
 class TacmaStat(object):
     'Computes statistics on TacmaData'
-    def __init__(self, dt):
-        ' dt - TacmaData object'
+    def __init__(self, dt, threaded=False, lazy=False):
+        """ dt - TacmaData object
+            threaded - whether to rebuild statistics in a background thread
+            lazy - whether to rebuild statistics only when they are queried
+        """
         self._dt = dt
         self._dt.emitter.subscribe(self, self._data_changed)
 
-        # --- Auxilliary data sets are modifyed during data_changed events
-        self._aux_init()
+        # {window length -> RollingWindow}
+        self._rolling = {d: RollingWindow(d)
+                         for d in tacmaopt.opt.rolling_windows}
+
+        # task x day worked and must seconds
+        self._cube = DayCube()
+
+        # --- Auxilliary data sets are rebuilt during data_changed events.
+        # Data version is increased on each change, latest built data
+        # is published as a snapshot
+        self._version = 0
+        self._snap = StatSnapshot(0, [])
+        self._lock = threading.Lock()
+        # [() -> None] functions called when a new snapshot is published
+        self._ready = []
+        self._worker = StatWorker(self._publish) if threaded else None
+        self._lazy = lazy
+        # rebuild waiting for a query in lazy mode: None or whether only
+        # data reading happened since the last rebuild
+        self._deferred = None
+
+        # --- Data sets derived from self._used snapshot.
+        # They are reset in self._actual() when a new snapshot is taken.
+        self._used = None
+        # {key -> PieceWiseFunc} Functions integrated by rolling windows:
+        # ('real', iden) -> task activity, ('must', iden) -> working portion,
+        # 'total' -> total working activity
+        self._rolling_funs = {}
+        # [(version, t0, t1)] day cube modifications waiting for a snapshot
+        # of given version
+        self._touched = []
+        # {(idens, bins) -> (closed sessions histogram, [running starts])}
+        self._heat = {}
+
+        # --- Memoized query results.
+        # {(version, query, iden, dur, quantized end time) -> value}
+        # in least recently used order
+        self._memo = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __deepcopy__(self, memo):
+        ' copies (used for archivation) are always computed synchronously'
+        ret = TacmaStat.__new__(TacmaStat)
+        memo[id(self)] = ret
+        for k, v in self.__dict__.iteritems():
+            if k not in ['_lock', '_ready', '_worker', '_memo']:
+                ret.__dict__[k] = copy.deepcopy(v, memo)
+        ret._lock = threading.Lock()
+        ret._ready = []
+        ret._worker = None
+        ret._memo = OrderedDict()
+        return ret
+
+    @property
+    def version(self):
+        '->int. Data version of the latest published statistics'
+        return self._snap.version
+
+    def subscribe_ready(self, func):
+        """ func -- () -> None. Called after new statistics were published.
+            Could be called from a worker thread.
+        """
+        self._ready.append(func)
+
+    def cache_info(self):
+        '-> (hits, misses, size). Query cache statistics'
+        return (self.cache_hits, self.cache_misses, len(self._memo))
 
     def last_session(self, iden):
         """ Returns:
                 duration of last session if this task is active or
                 has largest end time.
                 None otherwise
+            Computed in O(1) and not cached: quantized time could precede
+            the start of a session which has just begun.
         """
-        task = self._dt._gai(iden)
-        act_iden = self._dt.active_task()
-        if act_iden is not None:
-            if iden == act_iden:
-                return self._dt.curtime_to_int() - task.onoff[-1]
-            else:
-                return None
-        else:
-            iden_last, time_last, dur = None, 0, None
-            for a in self._dt.acts:
-                if len(a.onoff) > 0 and a.onoff[-1] > time_last:
-                    iden_last, time_last = a.iden, a.onoff[-1]
-                    dur = a.onoff[-1] - a.onoff[-2]
-            if iden_last == iden:
-                return dur
-            else:
-                return None
+        return self._last_session(iden, None, self._dt.curtime_to_int(),
+                                  True)
 
     def must_time(self, iden, dur, endtm=None):
         """ ->int.
@@ -41,9 +401,7 @@ class TacmaStat(object):
         [endtm - dur, endtm] time interval
         endtm=None -> endtm = current time
         """
-        t1 = self._dt.curtime_to_int() if endtm is None else endtm
-        t0 = max(0, t1 - dur)
-        return self._working_portion[iden].integral(t0, t1)
+        return self._memoized('must', iden, dur, endtm, self._must_time)
 
     def real_time(self, iden, dur, endtm=None):
         """ ->int.
@@ -51,65 +409,383 @@ class TacmaStat(object):
         [endtm - dur, endtm] time interval
         endtm=None -> endtm = current time
         """
-        task = self._dt._gai(iden)
-        t1 = self._dt.curtime_to_int() if endtm is None else endtm
-        t0 = max(0, t1 - dur)
-        return task.dur_within(t0, t1)
+        return self._memoized('real', iden, dur, endtm, self._real_time)
 
     def total_working_time(self, dur, endtm=None):
         """ ->int. Get duration when any task was active
         """
-        t1 = self._dt.curtime_to_int() if endtm is None else endtm
-        t0 = max(0, t1 - dur)
-        return self._working_activity.integral(t0, t1)
+        return self._memoized('total', None, dur, endtm,
+                              self._total_working_time)
 
-    def _data_changed(self, event, iden):
-        # TODO: this could be optimized
-        # Now it simply rebuilds all auxilliary data
-        # on every change
-        if event in ['NameChanged', 'CommentChanged']:
-            return
-        self._aux_reset()
+    def next_change(self, query, iden, dur, tm=None):
+        """ -> int or float('inf').
+        Returns the first moment after tm when the value of a query
+        changes at one second resolution.
+        query -- 'real', 'must', 'total' (iden is ignored) or
+                 'lses' (dur is ignored)
+        tm=None -> current time
+        """
+        if tm is None:
+            tm = self._dt.curtime_to_int()
+        if query == 'lses':
+            a = self._dt._gaa()
+            return tm + 1 if a is not None and a.iden == iden \
+                else float('inf')
+        snap = self._actual()
+        if query == 'real':
+            f = snap.onoff.get(iden)
+        elif query == 'must':
+            f = snap.working_portion.get(iden)
+        else:
+            f = snap.working_activity
+        if f is None:
+            return float('inf')
+        # value changes at t + 1 if values of f at leading edge t
+        # and at trailing edge t - dur differ.
+        # Otherwise move to the next section boundary at any edge.
+        t = tm
+        for i in range(64):
+            if t < dur:
+                vt, nt = 0, dur
+            else:
+                vt, nt = self._val_next(f, t - dur)
+                nt += dur
+            vl, nl = self._val_next(f, t)
+            if vl != vt:
+                return t + 1
+            t = min(nl, nt)
+            if t == float('inf'):
+                break
+        return t
 
-    def _aux_init(self):
-        ' all auxilliary data to zero'
-        # PieceWiseFun. Total working activity. Equals 1 if any task was
-        # active
-        self._working_activity = bproc.PieceWiseFun()
+    @staticmethod
+    def _val_next(f, t):
+        """->(value, float).
+        Value of f at t and the next section boundary after t"""
+        i = f.section_index(t)
+        if i == f.secnum():
+            return 0, float('inf')
+        if f.ip0(i) > t:
+            return 0, f.ip0(i)
+        return f.iv(i), f.ip1(i)
 
-        # {identifier -> PieceWiseFunc} Represents weigth [0, 1] of a task
-        # on a time line
-        self._weights = {}
+    def _memoized(self, query, iden, dur, endtm, func):
+        """ Returns func(iden, dur, tm, rolling) result from the cache.
+        tm is endtm (or current time) quantized to
+        opt.stat_cache_quantum, rolling is True if endtm is None.
+        """
+        rolling = endtm is None
+        tm = self._dt.curtime_to_int() if rolling else endtm
+        q = tacmaopt.opt.stat_cache_quantum
+        if q > 1:
+            tm -= tm % q
+        key = (self._actual().version, query, iden, dur, tm)
+        try:
+            ret = self._memo.pop(key)
+            self._memo[key] = ret
+            self.cache_hits += 1
+            return ret
+        except KeyError:
+            pass
+        self.cache_misses += 1
+        ret = func(iden, dur, tm, rolling)
+        self._memo[key] = ret
+        if len(self._memo) > tacmaopt.opt.stat_cache_size:
+            self._memo.popitem(last=False)
+        return ret
 
-        # {identifier -> PieceWiseFunc} Represents weigth [0, 1] of a task
-        # multiplied by total working activity
-        self._working_portion = {}
+    def _last_session(self, iden, dur, tm, rolling):
+        act = self._dt._gaa()
+        if act is not None:
+            if iden == act.iden:
+                return max(0, tm - act.onoff[-1])
+            else:
+                return None
+        else:
+            last = self._dt.last_closed_session()
+            if last is not None and last[0] == iden:
+                return last[2] - last[1]
+            else:
+                return None
 
-    def _aux_reset(self):
-        ' Reset working_activity, weights, workting portion'
-        self._aux_init()
-        d = self._dt
-        if d.act_count() == 0:
+    def _must_time(self, iden, dur, tm, rolling):
+        if rolling and dur in self._rolling:
+            return self._rolling_value(('must', iden), dur, tm)
+        f = self._actual().working_portion.get(iden)
+        if f is None:
+            return 0
+        return f.integral(max(0, tm - dur), tm)
+
+    def _real_time(self, iden, dur, tm, rolling):
+        if rolling and dur in self._rolling:
+            return int(round(self._rolling_value(('real', iden), dur, tm)))
+        return self._dt._gai(iden).dur_within(max(0, tm - dur), tm)
+
+    def _total_working_time(self, iden, dur, tm, rolling):
+        if rolling and dur in self._rolling:
+            return self._rolling_value('total', dur, tm)
+        return self._actual().working_activity.integral(max(0, tm - dur), tm)
+
+    def report(self, t0, t1, idens=None):
+        """ -> {iden: (worked, must)}.
+        Worked and must durations of tasks within [t0, t1] time interval.
+        Whole days are summed from the day cube, partial days at the edges
+        are computed from piecewise functions.
+        idens=None -> all tasks
+        """
+        if idens is None:
+            idens = [a.iden for a in self._dt.acts]
+        snap = self._actual()
+        c = self._cube
+        c.actualize(self._cube_funs(snap), self._dt.curtime_to_int())
+        # [d0, d1) - whole days within [t0, t1]
+        d0 = c.day_index(t0)
+        if c.day_start(d0) < t0:
+            d0 += 1
+        d1 = min(c.day_index(t1), c.ndays)
+        if d1 <= d0:
+            d0 = d1 = None
+        ret = {}
+        for iden in idens:
+            if iden not in snap.working_portion:
+                ret[iden] = (0, 0)
+                continue
+            fw = snap.onoff[iden]
+            fm = snap.working_portion[iden]
+            if d0 is None:
+                ret[iden] = (fw.integral(t0, t1), fm.integral(t0, t1))
+                continue
+            s0, s1 = c.day_start(d0), c.day_start(d1)
+            w = sum(c.work[iden][d0:d1]) + \
+                fw.integral(t0, s0) + fw.integral(s1, t1)
+            m = sum(c.must[iden][d0:d1]) + \
+                fm.integral(t0, s0) + fm.integral(s1, t1)
+            ret[iden] = (w, m)
+        return ret
+
+    # bucket name -> its length in seconds
+    buckets = {'hour': 3600, 'day': 86400, 'week': 604800}
+
+    def series(self, t0, t1, bucket='day', idens=None):
+        """ Generator of (bucket start, bucket end, worked, must) tuples.
+        Worked and must durations of given tasks summed within utc
+        calendar buckets ('hour', 'day' or 'week' starting on monday)
+        which cover [t0, t1]. First and last buckets are cut by t0, t1.
+        All values are computed in a single sweep through piecewise
+        functions of the latest statistics snapshot.
+        idens=None -> all tasks
+        """
+        length = self.buckets[bucket]
+        snap = self._actual()
+        if idens is None:
+            idens = snap.working_portion.keys()
+        funs = []
+        for iden in idens:
+            if iden in snap.working_portion:
+                funs.append([snap.onoff[iden], 0])
+                funs.append([snap.working_portion[iden], 0])
+        for f in funs:
+            f[1] = f[0].section_index(t0)
+        phase = self._phase(length)
+        b0 = t0
+        while b0 < t1:
+            b1 = min(t1, ((b0 + phase) // length + 1) * length - phase)
+            vals = [0, 0]
+            for k, f in enumerate(funs):
+                v, f[1] = f[0].integral_from(f[1], b0, b1)
+                vals[k % 2] += v
+            yield (b0, b1, vals[0], vals[1])
+            b0 = b1
+
+    def heatmap(self, idens=None, bins=1):
+        """ -> [[float]]. Hour of week activity histogram.
+        7 rows (monday first, utc) of 24 * bins seconds of activity of
+        given tasks folded over all weeks.
+        Histogram of closed sessions is cached until the next data version,
+        the running session is added on each call.
+        idens=None -> all tasks
+        """
+        snap = self._actual()
+        if idens is None:
+            idens = snap.onoff.keys()
+        key = (tuple(sorted(idens)), bins)
+        closed, running = self._heat.get(key, (None, None))
+        if closed is None:
+            intervals, running = [], []
+            for iden in key[0]:
+                f = snap.onoff.get(iden)
+                if f is None:
+                    continue
+                for i in range(f.secnum()):
+                    if f.ip1(i) == float('inf'):
+                        running.append(f.ip0(i))
+                    else:
+                        intervals.append((f.ip0(i), f.ip1(i)))
+            closed = fold_week(intervals, self._phase(604800), bins)
+            self._heat[key] = (closed, running)
+        if len(running) > 0:
+            tm = self._dt.curtime_to_int()
+            hist = fold_week([(t, tm) for t in running],
+                             self._phase(604800), bins, closed)
+        else:
+            hist = closed
+        n = 24 * bins
+        return [list(hist[i * n:(i + 1) * n]) for i in range(7)]
+
+    def _phase(self, length):
+        '->int. Shift of zero time from the previous utc bucket boundary'
+        sd = self._dt.start_date
+        phase = sd.minute * 60 + sd.second
+        if length >= 86400:
+            phase += sd.hour * 3600
+        if length >= 604800:
+            phase += sd.weekday() * 86400
+        return phase
+
+    def touch(self, t0=None, t1=None):
+        """ Marks [t0, t1] time interval as modified by manual edit.
+        Should be called before the next statistics rebuild.
+        t0=None -> whole data
+        t1=None -> up to current time
+        """
+        self._touched.append((self._version + 1, t0, t1))
+
+    def _cube_funs(self, snap):
+        '-> [(iden, worked PieceWiseFun, must PieceWiseFun)]'
+        return [(k, snap.onoff[k], v)
+                for k, v in snap.working_portion.iteritems()]
+
+    def _cube_reset(self):
+        ' clears day cube'
+        sd = self._dt.start_date
+        off = 0 if sd is None else \
+            sd.hour * 3600 + sd.minute * 60 + sd.second
+        self._cube.reset(off)
+
+    def _rolling_value(self, key, dur, tm):
+        '->float. Value of rolling window moved to tm'
+        self._actual()
+        w = self._rolling[dur]
+        w.advance(self._rolling_funs, tm)
+        return w.value(key) if key in self._rolling_funs else 0
+
+    def _actual(self):
+        """ -> StatSnapshot.
+        Returns latest published snapshot. Rebuilds derived data sets
+        if it has changed since the last call.
+        """
+        if self._deferred is not None:
+            read, self._deferred = self._deferred, None
+            self._rebuild(read)
+        snap = self._snap
+        if snap is self._used:
+            return snap
+        self._used = snap
+        self._memo.clear()
+        # rolling windows
+        self._rolling_funs = {'total': snap.working_activity}
+        for k, v in snap.working_portion.iteritems():
+            self._rolling_funs[('real', k)] = snap.onoff[k]
+            self._rolling_funs[('must', k)] = v
+        for w in self._rolling.values():
+            w.reset()
+        self._heat = {}
+        # day cube
+        rest = []
+        for v, t0, t1 in self._touched:
+            if v > snap.version:
+                rest.append((v, t0, t1))
+            elif t0 is None:
+                self._cube_reset()
+            else:
+                self._cube.touch(t0, t1)
+        self._touched = rest
+        return snap
+
+    def _publish(self, snap):
+        ' sets snap as the latest statistics if it is newer than current'
+        with self._lock:
+            if snap.version <= self._snap.version:
+                return
+            self._snap = snap
+        for f in self._ready:
+            f()
+
+    def _data_copy(self):
+        '-> [(iden, priority PieceWiseFun, onoff PieceWiseFun)]'
+        return [(a.iden, a.get_prior_pw(), a.get_work_pw())
+                for a in self._dt.acts]
+
+    def _fingerprint(self):
+        '->int. Revision of task data which statistics are built from'
+        return self._dt.revision
+
+    def save_snapshot(self, fn, file_hash, tm):
+        """ saves latest statistics to fn if they were built from current
+            data. file_hash -- content hash of written data file,
+            tm -- its save time
+        """
+        snap = self._snap
+        if snap.key is None or snap.key != self._fingerprint():
             return
+        try:
+            with open(fn, 'wb') as f:
+                snap.dump(f, file_hash, tm)
+        except Exception as e:
+            self._dt.ui.info('Failed to save statistics: %s' % str(e))
 
-        # 1. weights
-        # Non normalised priorities
-        ftmp = [a.get_prior_pw() for a in d.acts]
-        # Sum of all priorities
-        sumfun = bproc.PieceWiseFun.func(lambda *x: sum(x), *ftmp)
-        # Normalize priorities to get weights
-        for a, f in zip(d.acts, ftmp):
-            self._weights[a.iden] = bproc.PieceWiseFun.func(
-                lambda x, y: x / y, f, sumfun)
+    def _saved_snapshot(self):
+        '-> StatSnapshot or None. Statistics saved for the read data file'
+        fn = tacmaopt.opt.stat_snapshot_fn
+        if self._dt.file_hash is None or not os.path.isfile(fn):
+            return None
+        # saved statistics assume that active task was stopped on reading
+        if self._dt.active_task() is not None:
+            return None
+        try:
+            with open(fn, 'rb') as f:
+                return StatSnapshot.load(f, self._dt.file_hash,
+                                         self._version, self._fingerprint())
+        except Exception as e:
+            self._dt.ui.info('Failed to load statistics: %s' % str(e))
+            return None
 
-        # 2. total working activity
-        # activity for each task
-        ftmp = [a.get_work_pw() for a in d.acts]
-        # place 1 if any activity is 1
-        self._working_activity = \
-            bproc.PieceWiseFun.func(lambda *x: 1, *ftmp)
+    def _data_changed(self, changes):
+        if changes.fields <= set(['name', 'comment']):
+            return
+        if changes.has('Read', 'RemoveTask', 'Archivated'):
+            self.touch()
+        elif changes.t0 is not None:
+            t1 = None if changes.t1 == float('inf') else changes.t1
+            self.touch(changes.t0, t1)
+        self._memo.clear()
+        self._version += 1
+        read = all(e[0] == 'Read' for e in changes.events)
+        if not self._lazy:
+            self._rebuild(read)
+        elif self._deferred is None:
+            self._deferred = read
+        else:
+            self._deferred = self._deferred and read
 
-        # 3. working portion = weights * working_activity
-        self._working_portion = {a.iden: bproc.PieceWiseFun.func(
-            lambda x, y: x * y, self._weights[a.iden], self._working_activity)
-            for a in d.acts}
+    def _rebuild(self, read):
+        """ publishes or queues statistics of current data.
+            read -- whether data was just read from file and not modified
+        """
+        # data which was just read could have saved statistics
+        snap = self._saved_snapshot() if read else None
+        if snap is not None:
+            self._publish(snap)
+        elif self._worker is not None:
+            self._worker.submit(self._version, self._data_copy(),
+                                self._fingerprint())
+        else:
+            self._publish(StatSnapshot(self._version, self._data_copy(),
+                                       self._fingerprint()))
+
+    def _aux_reset(self):
+        ' Synchronously rebuilds working_activity, weights, workting portion'
+        self._memo.clear()
+        self._version += 1
+        self._publish(StatSnapshot(self._version, self._data_copy(),
+                                   self._fingerprint()))
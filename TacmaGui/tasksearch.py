@@ -0,0 +1,171 @@
+import bisect
+import heapq
+import math
+
+
+class TaskSearch(object):
+    """ Incremental search over names and comments of alive tasks.
+        Texts are indexed by all their 1, 2 and 3 character substrings,
+        so a query is resolved by intersecting a few identifier sets.
+        Results are ranked by frecency: each turn on adds 1 to a task
+        score which halves every halflife seconds.
+        Index is kept up to date by TacmaData events. Full rebuild after
+        data reading is postponed until the first search.
+    """
+    # frecency half life in seconds
+    halflife = 7 * 86400
+
+    def __init__(self, dt):
+        ' dt - TacmaData object'
+        self._dt = dt
+        self._dt.emitter.subscribe(self, self._data_changed)
+        self._reset()
+        # whether index should be rebuilt before use
+        self._dirty = False
+
+    def _reset(self):
+        # {ngram -> set of idens}
+        self._grams = {}
+        # {iden -> indexed lower case text}
+        self._text = {}
+        # {iden -> frecency key}. Key = log2(score) + time / halflife
+        # does not change with time and orders tasks by current score
+        self._frec = {}
+        # {iden -> (-frecency key, lower case name)} of alive tasks
+        self._key = {}
+        # [(-frecency key, lower case name, iden)] of alive tasks sorted
+        self._order = []
+        # identifier of active task
+        self._active = None
+
+    def search(self, text, limit=20):
+        """ -> [iden]. Alive tasks which names or comments contain
+            all words of text. Sorted by frecency, limited by limit.
+        """
+        if self._dirty:
+            self._rebuild()
+        words = text.lower().split()
+        if len(words) == 0:
+            return [x[2] for x in self._order[:limit]]
+        cands = None
+        for w in words:
+            for g in sorted(self._ngrams(w, 3), key=self._gram_size):
+                s = self._grams.get(g)
+                if not s:
+                    return []
+                cands = s if cands is None else cands & s
+                if not cands:
+                    return []
+        # words longer than 3 characters are only necessarily contained
+        long_words = [w for w in words if len(w) > 3]
+
+        def match(i):
+            return all(w in self._text[i] for w in long_words)
+
+        # scanning of ranked list until limit matches are found takes
+        # about limit * len(order) / len(cands) steps
+        if limit * len(self._order) > len(cands) ** 2:
+            cands = [i for i in cands if match(i)]
+            return heapq.nsmallest(limit, cands, key=self._key.__getitem__)
+        ret = []
+        for x in self._order:
+            if x[2] in cands and match(x[2]):
+                ret.append(x[2])
+                if len(ret) == limit:
+                    break
+        return ret
+
+    def frecency(self, iden, tm=None):
+        '->float. Current frecency score of a task'
+        if self._dirty:
+            self._rebuild()
+        if tm is None:
+            tm = self._dt.curtime_to_int()
+        k = self._frec.get(iden)
+        if k is None:
+            return 0
+        return 2 ** (k - float(tm) / self.halflife)
+
+    def _gram_size(self, g):
+        return len(self._grams.get(g, ()))
+
+    @staticmethod
+    def _ngrams(txt, n):
+        '->set of substrings of txt of length n (or txt if it is shorter)'
+        if len(txt) <= n:
+            return set([txt])
+        return set(txt[i:i + n] for i in range(len(txt) - n + 1))
+
+    def _add(self, a):
+        ' adds Act to index'
+        if not a.is_alive():
+            return
+        txt = (a.name + '\n' + a.comment).lower()
+        self._text[a.iden] = txt
+        grams = set()
+        for w in txt.split():
+            for n in range(1, 4):
+                grams |= self._ngrams(w, n)
+        for g in grams:
+            self._grams.setdefault(g, set()).add(a.iden)
+        self._key[a.iden] = (-self._frec.get(a.iden, -float('inf')),
+                             a.name.lower())
+        bisect.insort(self._order, self._key[a.iden] + (a.iden,))
+
+    def _remove(self, iden):
+        ' removes task from index'
+        txt = self._text.pop(iden, None)
+        if txt is None:
+            return
+        for w in txt.split():
+            for n in range(1, 4):
+                for g in self._ngrams(w, n):
+                    s = self._grams.get(g)
+                    if s is not None:
+                        s.discard(iden)
+                        if not s:
+                            self._grams.pop(g)
+        k = self._key.pop(iden)
+        self._order.pop(bisect.bisect_left(self._order, k + (iden,)))
+
+    def _use(self, iden, tm):
+        ' adds turn on event at tm to task frecency'
+        k = self._frec.get(iden)
+        h = float(tm) / self.halflife
+        if k is None or k - h < -50:
+            self._frec[iden] = h
+        else:
+            self._frec[iden] = h + math.log(2 ** (k - h) + 1, 2)
+
+    def _rebuild(self):
+        ' builds index and frecency from all tasks'
+        self._reset()
+        uses = []
+        for a in self._dt.acts:
+            uses.extend((t, a.iden) for t in a.onoff[::2])
+        uses.sort()
+        for t, iden in uses:
+            self._use(iden, t)
+        for a in self._dt.acts:
+            self._add(a)
+        self._active = self._dt.active_task()
+        self._dirty = False
+
+    def _data_changed(self, changes):
+        if self._dirty or changes.fields & set(['all', 'onoff']):
+            self._dirty = True
+            return
+        now = self._dt.curtime_to_int()
+        for event, iden in changes.events:
+            if event == 'ActiveTaskChanged':
+                if iden is not None and iden != self._active:
+                    self._use(iden, now)
+                self._active = iden
+        # reindex all changed tasks which still exist
+        for iden in changes.idens:
+            if iden is not None:
+                self._remove(iden)
+                try:
+                    self._add(self._dt._gai(iden))
+                except:
+                    pass
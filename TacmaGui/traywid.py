@@ -1,15 +1,23 @@
 "Tray icon widget"
 import functools
 import bproc
+import tacmaopt
 from PyQt5 import QtWidgets
 
 
 class TrayMenu(QtWidgets.QMenu):
     'Menu which is not closed after CheckBox click'
-    def __init__(self, data, parent=None):
-        'data - TacmaData object, parent - None'
+    def __init__(self, data, quick_switch=None, parent=None):
+        """ data - TacmaData object,
+            quick_switch - () -> None function opening quick switch popup,
+            parent - None
+        """
         super(TrayMenu, self).__init__(parent)
         self.data = data
+        self.quick_switch = quick_switch
+        # identifier of checked task
+        self._active = data.active_task()
+        self.aboutToShow.connect(self.update_next)
         #Otherwise first appearence of menu goes under screen on X11
         self.rebuild()
 
@@ -25,11 +33,19 @@ class TrayMenu(QtWidgets.QMenu):
             super(TrayMenu, self).mouseReleaseEvent(e)
 
     def _add_task_action(self, task):
-        """ adds task action to menu list
+        """ adds task action to menu list before exit section
             returns an action
         """
         if not task.is_alive():
             return
+        act = QtWidgets.QAction(task.name, self)
+        act.setCheckable(True)
+        act.setChecked(task.is_on())
+        act.triggered.connect(
+            functools.partial(self._act_task_checked, task.iden))
+        self.insertAction(self._tasks_end, act)
+        self._tact[task.iden] = act
+        return act
 
     def _act_task_checked(self, iden, b):
         """ called when tack line is triggered
@@ -44,70 +60,127 @@ class TrayMenu(QtWidgets.QMenu):
     def rebuild(self):
         'rebuilds menu. Writes all task activities to self._tact'
         self.clear()
+        # {iden -> QAction} of alive tasks
         self._tact = {}
+        # actions of tasks which are most behind their priorities
+        self._next = []
         stop_act = QtWidgets.QAction('Stop', self)
         stop_act.triggered.connect(
             functools.partial(self._act_task_checked, 0, False))
         self.addAction(stop_act)
+        if self.quick_switch is not None:
+            quick_act = QtWidgets.QAction('Quick switch...', self)
+            quick_act.triggered.connect(self._quick_triggered)
+            self.addAction(quick_act)
         self.addSeparator()
-        for task in self.data.acts:
-            if task.is_alive:
-                act = QtWidgets.QAction(task.name, self)
-                act.toggled.connect(
-                    functools.partial(self._act_task_checked, task.iden))
-                act.setCheckable(True)
-                self.addAction(act)
-                self._tact[task] = act
-        self.refresh_checkboxes()
-        self.addSeparator()
+        self._tasks_start = self.addSeparator()
+        self._tasks_end = self.addSeparator()
         exit_act = QtWidgets.QAction('Exit', self)
         exit_act.triggered.connect(QtWidgets.qApp.quit)
         self.addAction(exit_act)
+        for task in self.data.acts:
+            self._add_task_action(task)
+        self.update_next()
+
+    def update_next(self):
+        'refreshes entries of tasks which are most behind their priorities'
+        top = self.data.sched.top(tacmaopt.opt.scheduler_topk)
+        top = [x for x in top if x[1] > 0]
+        while len(self._next) < len(top):
+            act = QtWidgets.QAction(self)
+            act.triggered.connect(functools.partial(self._next_triggered,
+                                                    len(self._next)))
+            self.insertAction(self._tasks_start, act)
+            self._next.append(act)
+        for i, act in enumerate(self._next):
+            if i < len(top):
+                act.setText('Next: %s (%s behind)' % (
+                    self.data.name(top[i][0]),
+                    bproc.sec_to_strtime_interval(top[i][1], True)))
+                act.setData(top[i][0])
+            act.setVisible(i < len(top))
+        self._tasks_start.setVisible(len(top) > 0)
+
+    def _quick_triggered(self, *args):
+        self.close()
+        self.quick_switch()
+
+    def _next_triggered(self, i, *args):
+        self._act_task_checked(self._next[i].data(), True)
 
-    def refresh_checkboxes(self):
-        'refreshed checkboxes if menu is activated'
-        if self.isActiveWindow():
-            for k, v in self._tact.items():
-                v.toggled.disconnect()
-                v.setChecked(k.is_on())
-                v.toggled.connect(
-                    functools.partial(self._act_task_checked, k.iden))
+    def task_changed(self, changes):
+        'updates actions of tasks affected by TacmaData change set'
+        if 'all' in changes.fields:
+            self.rebuild()
+            self._active = self.data.active_task()
+            return
+        for event, iden in changes.events:
+            if event == 'NewTask':
+                try:
+                    self._add_task_action(self.data._gai(iden))
+                except:
+                    # removed before delivery
+                    pass
+            elif event in ['RemoveTask', 'TaskFinished']:
+                act = self._tact.pop(iden, None)
+                if act is not None:
+                    self.removeAction(act)
+                    act.deleteLater()
+            elif event == 'NameChanged':
+                if iden in self._tact:
+                    self._tact[iden].setText(self.data.name(iden))
+        idens = set(changes.with_field('active', 'onoff'))
+        idens.add(self._active)
+        for i in idens:
+            if i in self._tact:
+                self._tact[i].setChecked(self.data.is_on(i))
+        self._active = self.data.active_task()
 
 
 class TrayIcon(QtWidgets.QSystemTrayIcon):
-    'Tray icon for application'
-    def __init__(self, mw):
-        'mw - MainWindow'
+    """ Tray icon for application.
+        Could be shown before data is loaded, set_window connects it
+        to the main window.
+    """
+    def __init__(self):
         super(TrayIcon, self).__init__(bproc.get_icon('icon-stop'),
                                        QtWidgets.qApp)
+        self.win = None
+        self.data = None
+        self.setToolTip('loading...')
+
+    def set_window(self, mw):
+        'mw - MainWindow'
         self.win = mw
         self.data = mw.data
         self.data.emitter.subscribe(self, self._tacma_data_changed)
         self.setupUI()
-        self.setToolTip('no task')
+        self._update_icon()
 
     def setupUI(self):  # NOQA
         self.activated.connect(self._act_activated)
-        self.menu = TrayMenu(self.data)
+        self.menu = TrayMenu(self.data, self.win.show_quick_switch)
         self.setContextMenu(self.menu)
 
     def _act_activated(self, reason):
         'mouse press on icon'
-        if reason == self.Context:
-            self.menu.rebuild()
-        elif reason == self.Trigger:
+        if reason == self.Trigger:
             if self.win.isHidden():
                 self.win.setHidden(False)
                 self.win.raise_()
             else:
                 self.win.setHidden(True)
 
-    def _tacma_data_changed(self, event, iden):
-        if event == 'ActiveTaskChanged':
-            if iden is None:
-                self.setToolTip('no task')
-                self.setIcon(bproc.get_icon('icon-stop'))
-            else:
-                self.setToolTip('%s' % self.data._gai(iden).name)
-                self.setIcon(bproc.get_icon('icon-run'))
-            self.menu.refresh_checkboxes()
+    def _update_icon(self):
+        iden = self.data.active_task()
+        if iden is None:
+            self.setToolTip('no task')
+            self.setIcon(bproc.get_icon('icon-stop'))
+        else:
+            self.setToolTip('%s' % self.data._gai(iden).name)
+            self.setIcon(bproc.get_icon('icon-run'))
+
+    def _tacma_data_changed(self, changes):
+        if changes.fields & set(['active', 'all']):
+            self._update_icon()
+        self.menu.task_changed(changes)
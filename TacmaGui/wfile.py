@@ -1,31 +1,118 @@
 import os.path
+import hashlib
+import StringIO
 from datetime import datetime, timedelta
 import xml.etree.ElementTree as ET
 import tacmaopt
 import bproc
 from tacmastat import TacmaStat
+from scheduler import TaskScheduler
+from tasksearch import TaskSearch
 import copy
+from contextlib import contextmanager
 from act import Act
 
 
-class DataChangedEmitter(object):
+class ChangeSet(object):
     """
-    TacmaData emits signal on events.
-    Registered function should be of type: (str event, int iden)
+    Coalesced description of data changes delivered to subscribers.
     Events and iden list:
         'Read', iden = None. on TacmaData was read from file
         'ActiveTaskChanged', iden = new active task or None
         'NewTask', iden = identifier of a new task
         'RemoveTask', iden = identifier of removed task
+        'TaskFinished', iden = identifier of finished task
         'PriorityChanged', iden = identifier task with changed prior
         'NameChanged'
         'CommentChanged'
-        'ManualDataChanged', iden = task with changed data
+        'ManualDataChanged', iden = task with changed on/off data
+        'Archivated', iden = None. Old data was moved to archive and
+            time base was shifted
+    Each event changes a set of fields (see ChangeSet.event_fields).
+    Events which modify past data also give the modified time span.
+    """
+    # event -> fields changed by it
+    event_fields = {'Read': ['all'],
+                    'ActiveTaskChanged': ['active'],
+                    'NewTask': ['tasks'],
+                    'RemoveTask': ['tasks'],
+                    'TaskFinished': ['finished', 'priority'],
+                    'PriorityChanged': ['priority'],
+                    'NameChanged': ['name'],
+                    'CommentChanged': ['comment'],
+                    'ManualDataChanged': ['onoff'],
+                    'Archivated': ['all'],
+                    }
+
+    def __init__(self):
+        # [(event, iden)] in emission order without duplicates
+        self.events = []
+        # set of changed fields
+        self.fields = set()
+        # {iden -> set of changed fields}
+        self.idens = {}
+        # modified time span of past data or None
+        self.t0, self.t1 = None, None
+
+    def add(self, event, iden=None, t0=None, t1=None):
+        """ adds event. [t0, t1] -- modified time span.
+            t1 = None -> until now
+        """
+        if (event, iden) not in self.events:
+            self.events.append((event, iden))
+        f = self.event_fields[event]
+        self.fields.update(f)
+        self.idens.setdefault(iden, set()).update(f)
+        if t0 is not None:
+            self._add_span(t0, float('inf') if t1 is None else t1)
+
+    def merge(self, cs):
+        ' adds all changes from ChangeSet cs'
+        for e in cs.events:
+            if e not in self.events:
+                self.events.append(e)
+        self.fields.update(cs.fields)
+        for k, v in cs.idens.iteritems():
+            self.idens.setdefault(k, set()).update(v)
+        if cs.t0 is not None:
+            self._add_span(cs.t0, cs.t1)
+
+    def _add_span(self, t0, t1):
+        if self.t0 is None:
+            self.t0, self.t1 = t0, t1
+        else:
+            self.t0, self.t1 = min(self.t0, t0), max(self.t1, t1)
+
+    def has(self, *events):
+        '->bool. Whether any of events is in the change set'
+        return any(e[0] in events for e in self.events)
+
+    def with_field(self, *fields):
+        '->[iden]. Tasks which have any of fields changed'
+        return [k for k, v in self.idens.iteritems()
+                if not v.isdisjoint(fields)]
+
+
+class DataChangedEmitter(object):
+    """
+    TacmaData emits signal on events.
+    Registered function should be of type: (ChangeSet changes).
+    Events emitted one after another are coalesced into one ChangeSet if
+    they are held (see TacmaData.batch) or if delivery is deferred.
     """
 
     def __init__(self):
         # object -> function
         self.receivers = {}
+        # (() -> None) -> None. If set, schedules a delivery of collected
+        # events instead of immediate sending.
+        # For example functools.partial(QtCore.QTimer.singleShot, 0)
+        self.defer = None
+        # collected changes not yet delivered
+        self._pending = None
+        # changes collected before hold() or None if not holding
+        self._held = None
+        self._scheduled = False
 
     def subscribe(self, obj, func):
         self.receivers[obj] = func
@@ -33,55 +120,156 @@ class DataChangedEmitter(object):
     def unsubscribe(self, obj):
         self.receivers.pop(obj)
 
-    def emit(self, event, iden=None):
+    def emit(self, event, iden=None, t0=None, t1=None):
+        """ adds event to the pending change set and sends it unless
+            emitting is held or deferred.
+            [t0, t1] -- modified time span of past data if any
+        """
+        if self._pending is None:
+            self._pending = ChangeSet()
+        self._pending.add(event, iden, t0, t1)
+        self._deliver()
+
+    def hold(self):
+        ' collects events instead of sending them until release()'
+        self._held = self._pending or ChangeSet()
+        self._pending = None
+
+    def release(self, send=True):
+        """ stops collecting events. If send, delivers events collected
+            since hold() as one change set, otherwise drops them
+        """
+        held, self._held = self._held, None
+        if send and self._pending is not None:
+            held.merge(self._pending)
+        self._pending = held if held.events else None
+        self._deliver()
+
+    def flush(self):
+        ' sends pending change set to all receivers'
+        self._scheduled = False
+        cs, self._pending = self._pending, None
+        if cs is None:
+            return
         for f in self.receivers.values():
-            f(event, iden)
+            f(cs)
+
+    def _deliver(self):
+        if self._held is not None or self._pending is None:
+            return
+        if self.defer is None:
+            self.flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            self.defer(self.flush)
+
+
+def parse_data(fn):
+    """ ->(xml root, sha1 hex digest of contents) of data file.
+        Could be called from any thread
+    """
+    with open(fn, 'rb') as f:
+        txt = f.read()
+    return ET.fromstring(txt), hashlib.sha1(txt).hexdigest()
+
+
+class DataError(Exception):
+    'Data could not be read and blank data was declined'
+    pass
+
+
+class DataUI(object):
+    """ User interaction of TacmaData. This one prints messages
+        to console and never confirms. Graphical interface uses dialogs.
+    """
+    def info(self, txt):
+        print txt
+
+    def warning(self, txt):
+        print txt
+
+    def confirm(self, txt):
+        '->bool. Answer to a yes/no question'
+        print txt
+        return False
 
 
 class TacmaData(object):
-    def __init__(self, fname):
+    def __init__(self, fname, threaded_stat=False, parsed=None, ui=None,
+                 lazy_stat=False, keep_running=False):
         """ fname - data location
+            threaded_stat - compute statistics in a background thread
+            parsed - parse_data(fname) called beforehand or None
+            ui - DataUI object or None for console messages
+            lazy_stat - compute statistics only when they are queried
+            keep_running - do not stop active task at file save time
         """
-        print 'Reading data from %s' % os.path.abspath(fname)
+        self.ui = ui if ui is not None else DataUI()
+        self.ui.info('Reading data from %s' % os.path.abspath(fname))
         self.fname = fname
         self.emitter = DataChangedEmitter()
         self.acts = []
         self.start_date = None
         self.previous_fn = None  # previous data file
+        # sha1 digest of data file contents last read or written or None
+        self.file_hash = None
+        # number of task data modifications. Increased by self._modify()
+        # and task list changes
+        self.revision = 0
+        # Tracked data which is updated at each switch and rebuilt by
+        # self._track_reset() after manual modifications:
+        # {iden -> Act}
+        self._index = {}
+        # active Act or None
+        self._active = None
+        # (iden, start, end) of the most recent finished session or None
+        self._last_closed = None
+        # latest Act.last_stop() of inactive tasks or None
+        self._last_stop = None
+        # sum of current priorities of alive tasks
+        self._prior_sum = 0
+        # (depth, data state, write requested) of the running batch or None.
+        # Task states are added to data state by self._modify()
+        self._batch = None
         # Build statistic object before data read
-        self.stat = TacmaStat(self)
+        self.stat = TacmaStat(self, threaded_stat, lazy_stat)
+        self.sched = TaskScheduler(self)
+        self.search = TaskSearch(self)
 
         try:
-            self._read_data(self.fname)
+            self._read_data(self.fname, parsed, keep_running)
         except Exception as e:
-            print str(e)
+            self.ui.info(str(e))
             #if failed to read corrupted file
-            from PyQt5 import QtWidgets
             if os.path.isfile(tacmaopt.opt.backup_fn):
                 try:
-                    self._read_data(tacmaopt.opt.backup_fn)
+                    self._read_data(tacmaopt.opt.backup_fn,
+                                    keep_running=keep_running)
                     txt = "Unable to read original data."
                     txt += " Backup file was loaded"
-                    QtWidgets.QMessageBox.warning(None, "Tacma Warning", txt)
+                    self.ui.warning(txt)
                     return
                 except:
                     pass
             txt = "Data is corrupted and no backup was found."
             txt += "\nStart blank session?"
-            a = QtWidgets.QMessageBox.question(
-                None, "Tacma Error",
-                txt, QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
-            if a == QtWidgets.QMessageBox.No:
-                quit()
-            else:
-                self._read_data(None)
-
-    def _read_data(self, fn):
-        'reads data from fn if it exists or creates default data list'
+            if not self.ui.confirm(txt):
+                raise DataError('Failed to read %s: %s' % (fname, e))
+            self._read_data(None)
+
+    def _read_data(self, fn, parsed=None, keep_running=False):
+        """ reads data from fn if it exists or creates default data list.
+            parsed - parse_data(fn) result
+            keep_running - do not stop active task at file save time
+        """
+        self.file_hash = None
+        self.revision += 1
         if fn is None:
             self.start_date = datetime.utcnow()
         else:
-            root = ET.parse(fn).getroot()
+            if parsed is None:
+                parsed = parse_data(fn)
+            root, self.file_hash = parsed
             # read start date
             a = ['YEAR', 'MONTH', 'DAY', 'HOUR', 'MIN', 'SEC']
             a = map(lambda x: int(root.find('START_DATE/%s' % x).text), a)
@@ -96,26 +284,47 @@ class TacmaData(object):
                             root.findall('ACTIONS/ACTION'))
             # turn off active action
             sd = int(root.find('SAVE_TIME').text)
-            aa = self._gaa()
-            if aa:
-                aa.onoff.append(sd)
+            for a in self.acts:
+                if a.is_on() and not keep_running:
+                    a.onoff.append(sd)
+                    a._pw_actualize()
+            self._compact()
+        self._track_reset()
         try:
             self.emitter.emit('Read')
         except:
             import traceback
             traceback.print_exc()
 
+    def reload_if_changed(self):
+        """ ->bool. Reads data file again if it was modified by another
+            program (e.g. tacma-cli). Active task is kept running.
+        """
+        try:
+            with open(self.fname, 'rb') as f:
+                txt = f.read()
+            h = hashlib.sha1(txt).hexdigest()
+            if h == self.file_hash:
+                return False
+            root = ET.fromstring(txt)
+        except Exception:
+            # file could be partially written
+            return False
+        self.ui.info('Reading modified data from %s' % self.fname)
+        self._read_data(self.fname, (root, h), keep_running=True)
+        return True
+
     def archivate_if_needed(self, curtime):
         # if no need for achivating return
         if curtime < tacmaopt.opt.archivate * 7 * 24 * 60 * 60:
             return curtime
         # start archivation
         afn = tacmaopt.opt.new_archive_filename()
-        print "Archivating to ", afn
+        self.ui.info("Archivating to %s" % afn)
         # stop active task
         atask = self._gaa()
         if atask is not None:
-            atask.switch()
+            self._switch(atask)
         # calculate time interval which will be left
         delta = tacmaopt.opt.minactual * 7 * 24 * 60 * 60
         # create archive copy
@@ -126,6 +335,7 @@ class TacmaData(object):
         ac.write_data(afn)
         # modify self
         self.delete_before(curtime - delta)
+        self._compact()
         self.previous_fn = afn
         for a in ac.acts:
             arch_stop = a.last_stop()
@@ -133,14 +343,101 @@ class TacmaData(object):
             if anew is None:
                 continue
             anew.archived_stop = arch_stop - (curtime - delta)
-            if a.iden == 0:
-                print self.int_to_time(anew.archived_stop)
+        self._track_reset()
         # turn on active process
         if atask is not None:
-            atask.switch()
+            self._switch(atask)
+        # all stored times were shifted
+        self.emitter.emit('Archivated')
         return delta
 
+    @contextmanager
+    def batch(self):
+        """ Context which defers writing, events and statistics rebuild
+            until its end. Events are sent as a single change set.
+            Data is rolled back if an exception escapes the outermost batch.
+        """
+        if self._batch is not None:
+            self._batch[0] += 1
+            try:
+                yield
+            finally:
+                self._batch[0] -= 1
+            return
+        self._batch = [1, self._state(), False]
+        self.emitter.hold()
+        try:
+            yield
+        except:
+            st = self._batch[1]
+            self._batch = None
+            self.emitter.release(False)
+            self._restore(st)
+            raise
+        need_write = self._batch[2]
+        self._batch = None
+        if need_write:
+            self.write_data()
+        self.emitter.release()
+
+    def _compact(self):
+        """ ->(int, int, [Act]). Compacts histories of all tasks.
+            Returns numbers of removed onoff and prior entries
+            and changed tasks.
+        """
+        n1, n2, changed = 0, 0, []
+        for a in self.acts:
+            self._modify(a)
+            r = a.compact()
+            if r != (0, 0):
+                n1 += r[0]
+                n2 += r[1]
+                changed.append(a)
+        if changed:
+            self.ui.info('Compacted: %d on/off and %d priority entries removed'
+                         % (n1, n2))
+        return n1, n2, changed
+
+    def compact(self):
+        """ ->(int, int). Removes zero-length sessions and pauses and
+            redundant priority changes from all tasks.
+            Returns numbers of removed onoff and prior entries.
+        """
+        with self.batch():
+            n1, n2, changed = self._compact()
+            if changed:
+                self._track_reset()
+                self.write_data()
+            for a in changed:
+                self.emitter.emit('ManualDataChanged', a.iden)
+        return n1, n2
+
+    def _state(self):
+        """ ->copy of data for self._restore(). Task states are not
+            copied here but by self._modify() before a task is changed
+        """
+        return (self.start_date, self.previous_fn, list(self.acts), {})
+
+    def _modify(self, a):
+        """ increases data revision and saves state of Act before
+            its first change within a batch
+        """
+        self.revision += 1
+        if self._batch is not None and a not in self._batch[1][3]:
+            self._batch[1][3][a] = a.state()
+
+    def _restore(self, st):
+        ' restores data saved by self._state()'
+        self.start_date, self.previous_fn, self.acts, modified = st
+        self.revision += 1
+        for a, ast in modified.iteritems():
+            a.restore(ast)
+        self._track_reset()
+
     def write_data(self, fn=None):
+        if fn is None and self._batch is not None:
+            self._batch[2] = True
+            return
         tm = self.time_to_int(datetime.utcnow())
         # check for archivation only in regular saves
         if fn is None:
@@ -170,9 +467,18 @@ class TacmaData(object):
         #write to file
         bproc.xmlindent(root)
         tree = ET.ElementTree(root)
-        if fn is None:
-            fn = self.fname
-        tree.write(fn, xml_declaration=True, encoding='utf-8')
+        if fn is not None:
+            tree.write(fn, xml_declaration=True, encoding='utf-8')
+            return
+        # regular save also stores statistics for the next start
+        buf = StringIO.StringIO()
+        tree.write(buf, xml_declaration=True, encoding='utf-8')
+        txt = buf.getvalue()
+        with open(self.fname, 'wb') as f:
+            f.write(txt)
+        self.file_hash = hashlib.sha1(txt).hexdigest()
+        self.stat.save_snapshot(tacmaopt.opt.stat_snapshot_fn,
+                                self.file_hash, tm)
 
     def time_to_int(self, tm):
         'calendar utc time to number of seconds since creation'
@@ -202,9 +508,12 @@ class TacmaData(object):
     def add_action(self, name, prior, comment=''):
         'adds task. Returns its identifier'
         iden = self._next_iden()
+        self.revision += 1
         self.acts.append(Act(iden, name, prior, self))
-        if comment != '':
-            self.set_comment(iden, comment)
+        self.acts[-1].comment = comment
+        self._index[iden] = self.acts[-1]
+        self._prior_sum += prior
+        self._last_stop = max(self._last_stop, self.acts[-1].last_stop())
         self.write_data()
         self.emitter.emit('NewTask', iden)
         return iden
@@ -216,6 +525,7 @@ class TacmaData(object):
     def change_action_name(self, iden, newname):
         a = self._gai(iden)
         if a.name != newname:
+            self._modify(a)
             a.name = newname
             self.write_data()
             self.emitter.emit('NameChanged', iden)
@@ -224,42 +534,62 @@ class TacmaData(object):
         a = self._gai(iden)
         if a is None:
             return
-        bu = copy.deepcopy(a.onoff)
+        self._modify(a)
+        bu = list(a.onoff)
         try:
             del a.onoff[:]
-            a.onoff.extend(copy.deepcopy(newonoff))
+            a.onoff.extend(newonoff)
             a._pw_actualize()
-            self.emitter.emit("ManualDataChanged", iden)
+            self._track_reset()
+            # changed time span: times which present only in one list
+            diff = set(bu).symmetric_difference(a.onoff)
+            if diff:
+                self.emitter.emit("ManualDataChanged", iden,
+                                  min(diff), max(diff))
         except Exception as e:
-            print "ONOFF modification failed: ", str(e)
+            self.ui.warning("ONOFF modification failed: %s" % str(e))
             del a.onoff[:]
             a.onoff.extend(bu)
+            a._pw_actualize()
+            self._track_reset()
 
     def reset_action_prior(self, iden, newprior):
         a = self._gai(iden)
         if a is None:
             return
-        bu = copy.deepcopy(a.prior)
+        self._modify(a)
+        bu = list(a.prior)
         try:
             del a.prior[:]
-            a.prior.extend(copy.deepcopy(newprior))
+            a.prior.extend(map(tuple, newprior))
             a._pw_actualize()
-            self.emitter.emit("PriorityChanged", iden)
+            self._track_reset()
+            # weights are changed from the first differing entry onward
+            diff = set(bu).symmetric_difference(a.prior)
+            if diff:
+                self.emitter.emit("PriorityChanged", iden, min(diff)[0])
         except Exception as e:
-            print "Priority modification failed: ", str(e)
+            self.ui.warning("Priority modification failed: %s" % str(e))
             del a.prior[:]
             a.prior.extend(bu)
+            a._pw_actualize()
+            self._track_reset()
 
     def change_action_prior(self, iden, newprior):
         a = self._gai(iden)
         if a.current_priority() != newprior:
+            self._modify(a)
+            if a.is_alive():
+                self._prior_sum += newprior - a.current_priority()
             a.set_priority(newprior)
             self.write_data()
             self.emitter.emit('PriorityChanged', iden)
 
     def set_comment(self, iden, txt):
-        if self._gai(iden).comment != txt:
-            self._gai(iden).comment = txt
+        a = self._gai(iden)
+        if a.comment != txt:
+            self._modify(a)
+            a.comment = txt
             self.write_data()
             self.emitter.emit('CommentChanged', iden)
 
@@ -268,19 +598,54 @@ class TacmaData(object):
 
     def _gai(self, iden):
         '->Act. Get action by id'
-        for a in self.acts:
-            if a.iden == iden:
-                return a
-        else:
+        try:
+            return self._index[iden]
+        except KeyError:
             raise Exception('Action (id = %i) was not found' % iden)
 
     def _gaa(self):
         '->Act or None. Get active action'
+        return self._active
+
+    def _switch(self, a):
+        ' switches action on/off status and tracks sessions'
+        self._modify(a)
+        a.switch()
+        if a.is_on():
+            self._active = a
+        else:
+            self._active = None
+            self._last_closed = (a.iden, a.onoff[-2], a.onoff[-1])
+            self._last_stop = max(self._last_stop, a.last_stop())
+
+    def _track_reset(self):
+        ' rebuilds all tracked data'
+        self._index = {a.iden: a for a in self.acts}
+        self._active = None
+        self._last_closed = None
+        self._last_stop = None
+        self._prior_sum = 0
         for a in self.acts:
             if a.is_on():
-                return a
-        else:
-            return None
+                self._active = a
+            else:
+                self._last_stop = max(self._last_stop, a.last_stop())
+            if a.is_alive():
+                self._prior_sum += a.current_priority()
+            n = len(a.onoff) - len(a.onoff) % 2
+            if n > 0 and (self._last_closed is None or
+                          a.onoff[n - 1] > self._last_closed[2]):
+                self._last_closed = (a.iden, a.onoff[n - 2], a.onoff[n - 1])
+
+    def last_closed_session(self):
+        '->(iden, start, end) or None. The most recent finished session'
+        return self._last_closed
+
+    def last_stop(self):
+        """ ->int or None. Latest Act.last_stop() among all tasks.
+            None if there is an active task
+        """
+        return self._last_stop if self._active is None else None
 
     def name(self, iden):
         '->str. Get action name by id'
@@ -292,10 +657,7 @@ class TacmaData(object):
 
     def weight(self, iden):
         '->float. Get action weight = priority/sum of all priorities'
-        s = 0
-        for a in self.acts:
-            if a.is_alive():
-                s += a.current_priority()
+        s = self._prior_sum
         if s == 0:
             return 0
         else:
@@ -325,8 +687,8 @@ class TacmaData(object):
         if aa:
             if aa.iden == iden:
                 return
-            aa.switch()
-        self._gai(iden).switch()
+            self._switch(aa)
+        self._switch(self._gai(iden))
         self.write_data()
         self.emitter.emit('ActiveTaskChanged', self._gaa().iden)
 
@@ -334,42 +696,174 @@ class TacmaData(object):
         'Stop active task'
         aa = self._gaa()
         if aa:
-            aa.switch()
+            self._switch(aa)
         self.write_data()
         self.emitter.emit('ActiveTaskChanged')
 
     def finish(self, iden):
         'Finish task'
         a = self._gai(iden)
+        self._modify(a)
+        if a.is_alive():
+            self._prior_sum -= a.current_priority()
         if a.current_priority() != 0:
             a.set_priority(0)
-        if a.is_on():
-            a.switch()
+        was_on = a.is_on()
+        if was_on:
+            self._switch(a)
         a.finished = self.curtime_to_int()
         self.write_data()
+        self.emitter.emit('TaskFinished', iden)
+        if was_on:
+            self.emitter.emit('ActiveTaskChanged')
 
     def remove(self, iden):
         'Completely remove task from all statistics'
         a = self._gai(iden)
+        self.revision += 1
         self.acts.remove(a)
+        self._track_reset()
         self.write_data()
         self.emitter.emit('RemoveTask', iden)
 
+    # Bulk session editing. Each operation is done in a single batch so
+    # statistics are updated once for the whole modified time span.
+    def _acts_by(self, idens):
+        '->[Act] by identifiers or all tasks if idens is None'
+        if idens is None:
+            return list(self.acts)
+        return [self._gai(i) for i in idens]
+
+    def _check_sessions(self, a, ses):
+        ' raises ValueError if sessions are out of task lifetime'
+        t1 = a.finished if a.finished is not None else self.curtime_to_int()
+        for x in ses:
+            if x[0] < a.created or x[1] > t1:
+                raise ValueError('Session is out of "%s" lifetime' % a.name)
+
+    def _sessions_changed(self, a, t0, t1):
+        a._pw_actualize()
+        self.emitter.emit('ManualDataChanged', a.iden, t0, t1)
+
+    def shift_sessions(self, t0, t1, delta, idens=None):
+        """ moves activity within [t0, t1) by delta seconds.
+            idens - tasks identifiers or None for all tasks.
+            Raises ValueError leaving data unchanged if activity
+            goes out of task lifetime.
+        """
+        with self.batch():
+            for a in self._acts_by(idens):
+                if not a.touches(t0, t1):
+                    continue
+                self._modify(a)
+                ses = a.cut_sessions(t0, t1)
+                if ses:
+                    ses = [(x + delta, y + delta) for x, y in ses]
+                    self._check_sessions(a, ses)
+                    a.put_sessions(ses)
+                    self._sessions_changed(a, t0 + min(0, delta),
+                                           t1 + max(0, delta))
+            self._track_reset()
+            self.write_data()
+
+    def move_sessions(self, t0, t1, src, dst):
+        """ moves activity within [t0, t1) from src task to dst task.
+            Raises ValueError leaving data unchanged if activity
+            goes out of dst lifetime. Nothing is done if src is dst.
+        """
+        a, b = self._gai(src), self._gai(dst)
+        if a is b or not a.touches(t0, t1):
+            return
+        with self.batch():
+            self._modify(a)
+            self._modify(b)
+            ses = a.cut_sessions(t0, t1)
+            if ses:
+                self._check_sessions(b, ses)
+                b.put_sessions(ses)
+                self._sessions_changed(a, t0, t1)
+                self._sessions_changed(b, t0, t1)
+                self._track_reset()
+                self.write_data()
+
+    def split_session(self, iden, tm, gap=1):
+        """ ->bool. Splits session of a task at tm with a pause of gap
+            seconds. False if task was not on at tm.
+            Raises ValueError if gap is less than one second: zero pauses
+            are removed by compaction.
+        """
+        if gap < 1:
+            raise ValueError('Pause should last at least one second')
+        a = self._gai(iden)
+        with self.batch():
+            self._modify(a)
+            ret = a.split_session(tm, gap)
+            if ret:
+                self._sessions_changed(a, tm, tm + gap)
+                self._track_reset()
+                self.write_data()
+        return ret
+
+    def merge_sessions(self, t0, t1, max_gap=None, idens=None):
+        """ ->int. Merges consecutive sessions starting within [t0, t1)
+            with pauses not longer than max_gap seconds (None - any).
+            Returns number of removed pauses.
+        """
+        ret = 0
+        with self.batch():
+            for a in self._acts_by(idens):
+                if not a.touches(t0, t1):
+                    continue
+                self._modify(a)
+                n = a.merge_sessions(t0, t1, max_gap)
+                if n > 0:
+                    self._sessions_changed(a, t0, t1)
+                ret += n
+            if ret > 0:
+                self._track_reset()
+                self.write_data()
+        return ret
+
+    def drop_short_sessions(self, min_length, t0=None, t1=None, idens=None):
+        """ ->int. Removes closed sessions shorter than min_length seconds
+            starting within [t0, t1) (None - unbounded).
+            Returns number of removed sessions.
+        """
+        ret = 0
+        with self.batch():
+            for a in self._acts_by(idens):
+                if not a.touches(t0, t1):
+                    continue
+                self._modify(a)
+                rm = a.drop_short_sessions(min_length, t0, t1)
+                if rm:
+                    self._sessions_changed(a, rm[0][0],
+                                           max(x[1] for x in rm))
+                ret += len(rm)
+            if ret > 0:
+                self._track_reset()
+                self.write_data()
+        return ret
+
     def delete_before(self, tm):
         """ deletes all data before tm
         """
+        self.revision += 1
         # acts
         for a in self.acts:
             a.delete_before(tm)
             a.shift_time(-tm)
         # curtime
         self.start_date = self.int_to_time(tm)
+        self._track_reset()
         # reset stat
+        self.stat.touch()
         self.stat._aux_reset()
 
     def delete_after(self, tm):
         """ deletes all data after tm
         """
+        self.revision += 1
         rmtasks = []
         for a in self.acts:
             need = a.delete_after(tm)
@@ -377,7 +871,9 @@ class TacmaData(object):
                 rmtasks.append(a)
         for r in rmtasks:
             self.acts.remove(r)
+        self._track_reset()
         # reset stat
+        self.stat.touch()
         self.stat._aux_reset()
 
 
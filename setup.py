@@ -75,7 +75,9 @@ setup(
     version=config.version,
     packages=['TacmaGui'],
     entry_points={
-        'gui_scripts': ['%s = TacmaGui.tacma:main' % config.progname]},
+        'gui_scripts': ['%s = TacmaGui.tacma:main' % config.progname],
+        'console_scripts': [
+            '%s-cli = TacmaGui.tacmacli:main' % config.progname.lower()]},
 
     package_data={
             'TacmaGui': ['misc/*.png']
@@ -0,0 +1,76 @@
+""" Helpers for TacmaGui tests. Run from the project root with
+        python -m unittest discover tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import xml.etree.ElementTree as ET
+
+# program modules import each other by their plain names
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'TacmaGui'))
+import tacmaopt
+
+
+class Quiet(object):
+    'DataUI which keeps messages'
+    def __init__(self):
+        self.messages = []
+
+    def info(self, txt):
+        self.messages.append(txt)
+
+    def warning(self, txt):
+        self.messages.append(txt)
+
+    def confirm(self, txt):
+        self.messages.append(txt)
+        return False
+
+
+class DataTestCase(unittest.TestCase):
+    """ Creates program options in a temporary working directory.
+        write_data() builds a data file started days ago.
+    """
+    def setUp(self):
+        self.wdir = tempfile.mkdtemp()
+        tacmaopt.ProgOptions.wdir = self.wdir
+        tacmaopt.ProgOptions.ver = 'test'
+        tacmaopt.opt = tacmaopt.ProgOptions()
+        tacmaopt.opt._fnames_to_wd()
+
+    def tearDown(self):
+        shutil.rmtree(self.wdir)
+
+    def write_data(self, acts, days=10, save_time=None):
+        """ ->str. Writes data file.
+            acts -- [(name, onoff list, prior list)]
+        """
+        start = datetime.utcnow() - timedelta(days=days)
+        root = ET.Element('TacmaData')
+        sd = ET.SubElement(root, 'START_DATE')
+        for k, v in zip(['YEAR', 'MONTH', 'DAY', 'HOUR', 'MIN', 'SEC'],
+                        [start.year, start.month, start.day,
+                         start.hour, start.minute, start.second]):
+            ET.SubElement(sd, k).text = str(v)
+        if save_time is None:
+            save_time = days * 86400
+        ET.SubElement(root, 'SAVE_TIME').text = str(save_time)
+        d = ET.SubElement(root, 'ACTIONS')
+        for i, (name, onoff, prior) in enumerate(acts):
+            a = ET.SubElement(d, 'ACTION', name=name, id=str(i))
+            ET.SubElement(a, 'ONOFF').text = ' '.join(map(str, onoff))
+            ET.SubElement(a, 'PRIORITY').text = ' '.join(map(str, prior))
+            ET.SubElement(a, 'CREATED').text = '0'
+            ET.SubElement(a, 'ARCHIVED_STOP').text = '0'
+        fn = os.path.join(self.wdir, 'data.xml')
+        ET.ElementTree(root).write(fn)
+        return fn
+
+    def load(self, fn, **kw):
+        '->wfile.TacmaData'
+        import wfile
+        return wfile.TacmaData(fn, ui=Quiet(), **kw)
@@ -0,0 +1,62 @@
+import os
+import sys
+import StringIO
+import subprocess
+import unittest
+from common import DataTestCase
+
+
+class CliTest(DataTestCase):
+    def run_cli(self, *argv):
+        '->(exit code, stdout text)'
+        out, sys.stdout = sys.stdout, StringIO.StringIO()
+        err, sys.stderr = sys.stderr, StringIO.StringIO()
+        cwd = os.getcwd()
+        os.chdir(self.wdir)
+        try:
+            import tacmacli
+            ret = tacmacli.main(list(argv))
+            return ret, sys.stdout.getvalue()
+        finally:
+            os.chdir(cwd)
+            sys.stdout, sys.stderr = out, err
+
+    def test_stdout_is_clean(self):
+        # options file is absent and data is archivated on the first save
+        fn = self.write_data([('alpha', [100, 200, 86400, 86500], [0, 1]),
+                              ('beta', [300, 400], [0, 1])], days=200)
+        self.assertEqual(self.run_cli('-f', fn, 'start', 'beta'),
+                         (0, 'Started: beta\n'))
+        self.assertTrue(os.path.isfile(os.path.join(self.wdir,
+                                                    'archiveData1.xml')))
+        ret, txt = self.run_cli('-f', fn, 'status')
+        self.assertEqual(txt.split()[0], 'beta')
+        self.assertEqual(self.run_cli('-f', fn, 'start', 'gamma'), (1, ''))
+
+    def test_init(self):
+        fn = os.path.join(self.wdir, 'new.xml')
+        self.assertEqual(self.run_cli('-f', fn, 'list'), (1, ''))
+        self.assertFalse(os.path.isfile(fn))
+        self.assertEqual(self.run_cli('-f', fn, '--init', 'add', 'alpha'),
+                         (0, 'Added: 0 alpha\n'))
+        self.assertEqual(self.run_cli('-f', fn, 'start', 'alpha'),
+                         (0, 'Started: alpha\n'))
+        # corrupted data is not overwritten without --init
+        with open(fn, 'w') as f:
+            f.write('<TacmaData>')
+        self.assertEqual(self.run_cli('-f', fn, 'list'), (1, ''))
+        with open(fn) as f:
+            self.assertEqual(f.read(), '<TacmaData>')
+
+    def test_no_qt(self):
+        import tacmacli
+        src = os.path.dirname(os.path.abspath(tacmacli.__file__))
+        txt = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys; sys.path.insert(0, %r); import tacmacli, wfile; '
+            'print "PyQt5" in sys.modules' % src])
+        self.assertEqual(txt.strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
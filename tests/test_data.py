@@ -0,0 +1,74 @@
+import unittest
+from common import DataTestCase
+
+
+class BatchTest(DataTestCase):
+    def setUp(self):
+        super(BatchTest, self).setUp()
+        fn = self.write_data([('a', [100, 200, 300, 400], [0, 1]),
+                              ('b', [500, 600], [0, 2]),
+                              ('c', [700, 800], [0, 1])])
+        self.dt = self.load(fn)
+
+    def test_rollback(self):
+        dt = self.dt
+        before = [a.state() for a in dt.acts]
+        with self.assertRaises(ValueError):
+            with dt.batch():
+                dt.turn_on(0)
+                dt.change_action_name(1, 'bb')
+                dt.merge_sessions(0, 1000)
+                dt.add_action('d', 1)
+                raise ValueError()
+        self.assertEqual([a.state() for a in dt.acts], before)
+        self.assertIsNone(dt.active_task())
+
+    def test_only_changed_tasks_are_saved(self):
+        dt = self.dt
+        with dt.batch():
+            dt.shift_sessions(450, 650, 10)
+            self.assertEqual(dt._batch[1][3].keys(), [dt._gai(1)])
+        self.assertEqual(dt._gai(1).onoff, [510, 610])
+
+
+class SessionEditTest(DataTestCase):
+    def test_split_survives_reload(self):
+        fn = self.write_data([('a', [100, 1000], [0, 1])])
+        dt = self.load(fn)
+        with self.assertRaises(ValueError):
+            dt.split_session(0, 500, 0)
+        self.assertTrue(dt.split_session(0, 500))
+        self.assertEqual(dt._gai(0).onoff, [100, 500, 501, 1000])
+        dt.write_data()
+        self.assertEqual(self.load(fn)._gai(0).onoff, [100, 500, 501, 1000])
+
+    def test_move_sessions(self):
+        fn = self.write_data([('a', [100, 200, 300, 400], [0, 1]),
+                              ('b', [500, 600], [0, 1])])
+        dt = self.load(fn)
+        events = []
+        dt.emitter.subscribe(self, lambda cs: events.append(cs.events))
+        h = dt.file_hash
+        dt.move_sessions(0, 1000, 0, 0)
+        self.assertEqual(dt._gai(0).onoff, [100, 200, 300, 400])
+        self.assertEqual((events, dt.file_hash), ([], h))
+        dt.move_sessions(150, 350, 0, 1)
+        self.assertEqual(dt._gai(0).onoff, [100, 150, 350, 400])
+        self.assertEqual(dt._gai(1).onoff, [150, 200, 300, 350, 500, 600])
+        self.assertEqual(len(events), 1)
+        self.assertNotEqual(dt.file_hash, h)
+
+    def test_merge_sessions(self):
+        fn = self.write_data([('a', [100, 200, 300, 400, 500, 600], [0, 1]),
+                              ('b', [100, 200, 210, 300, 700, 800], [0, 1])])
+        dt = self.load(fn)
+        self.assertEqual(dt.merge_sessions(0, 1000, 50), 1)
+        self.assertEqual(dt._gai(1).onoff, [100, 300, 700, 800])
+        # any pause
+        self.assertEqual(dt.merge_sessions(0, 1000), 3)
+        self.assertEqual(dt._gai(0).onoff, [100, 600])
+        self.assertEqual(dt._gai(1).onoff, [100, 800])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from common import DataTestCase
+try:
+    from PyQt5 import QtCore
+except ImportError:
+    QtCore = None
+
+
+@unittest.skipIf(QtCore is None, 'PyQt5 is not installed')
+class FilterModelTest(DataTestCase):
+    def test_sort_by_finished(self):
+        from mtab import ViewModel, FilterModel
+        fn = self.write_data([('a', [100, 200], [0, 1]),
+                              ('b', [300, 400], [0, 1]),
+                              ('c', [500, 600], [0, 1]),
+                              ('d', [700, 800], [0, 1])])
+        dt = self.load(fn)
+        dt.finish(1)
+        dt.finish(3)
+        model = ViewModel(dt)
+        proxy = FilterModel()
+        proxy.setSourceModel(model)
+        col = ViewModel.cnames['finished'][0]
+        for order in [QtCore.Qt.AscendingOrder, QtCore.Qt.DescendingOrder]:
+            proxy.sort(col, order)
+            finished = [proxy.index(r, col).data(ViewModel.SortRole)
+                        for r in range(proxy.rowCount())]
+            # TOTAL row is the last one
+            self.assertTrue(proxy.index(proxy.rowCount() - 1, col).data(
+                ViewModel.TotalRole))
+            finished = [x is not None for x in finished[:-1]]
+            if order == QtCore.Qt.AscendingOrder:
+                self.assertEqual(finished, [True, True, False, False])
+            else:
+                self.assertEqual(finished, [False, False, True, True])
+
+    def test_cells_computed_on_demand(self):
+        from mtab import ViewModel
+        fn = self.write_data([('a', [100, 200], [0, 1]),
+                              ('b', [300, 400], [0, 1])])
+        model = ViewModel(self.load(fn))
+        self.assertEqual(model.sort_value(1, 'title'), 'b')
+        computed = [v is not ViewModel._stale for v in model._rows[1]]
+        self.assertEqual(computed.count(True), 1)
+        self.assertNotIn(0, model._rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
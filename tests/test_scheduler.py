@@ -0,0 +1,47 @@
+import time
+import unittest
+from common import DataTestCase
+
+
+class SchedulerTest(DataTestCase):
+    def check_keys(self, dt):
+        'ranking is equal to freshly evaluated deficits'
+        # wait for statistics of the latest data
+        while dt.stat.version != dt.stat._version:
+            time.sleep(0.01)
+        top = dt.sched.top(dt.act_count())
+        for iden, d in top:
+            self.assertAlmostEqual(d, dt.sched._eval(iden))
+            self.assertAlmostEqual(d, dt.sched.deficit(iden))
+        self.assertEqual([x[1] for x in top],
+                         sorted([x[1] for x in top], reverse=True))
+
+    def test_renormalization(self):
+        fn = self.write_data([('a', [100, 5000], [0, 1]),
+                              ('b', [6000, 9000], [0, 1]),
+                              ('c', [9000, 20000], [0, 3])])
+        for threaded in [False, True]:
+            dt = self.load(fn, threaded_stat=threaded)
+            now = [dt.curtime_to_int()]
+            dt.curtime_to_int = lambda: now[0]
+            dt.turn_on(0)
+            self.check_keys(dt)
+            now[0] += 3600
+            dt.change_action_prior(2, 10)
+            self.check_keys(dt)
+            now[0] += 3600
+            dt.add_action('d', 5)
+            self.check_keys(dt)
+            now[0] += 3600
+            dt.turn_on(1)
+            dt.finish(2)
+            self.check_keys(dt)
+            self.assertNotIn(2, [x[0] for x in dt.sched.top(10)])
+            self.assertIsNone(dt.sched.deficit(2))
+            # deficits drift with time without any data change
+            now[0] += 3600
+            self.check_keys(dt)
+
+
+if __name__ == '__main__':
+    unittest.main()
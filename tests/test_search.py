@@ -0,0 +1,26 @@
+import unittest
+from common import DataTestCase
+import tacmaopt
+
+
+class ArchivationTest(DataTestCase):
+    def test_frecency_after_archivation(self):
+        days = 30
+        fn = self.write_data([('alpha', [100, 200, 86400, 86500], [0, 1]),
+                              ('beta', [300, 400], [0, 1]),
+                              ('gamma', [600, 700], [0, 1])], days=days)
+        tacmaopt.opt.archivate = 2
+        tacmaopt.opt.minactual = 1
+        dt = self.load(fn)
+        self.assertEqual(dt.search.search('a')[0], 0)
+        dt.turn_on(2)
+        # data was archivated on save and time base was shifted
+        self.assertIsNotNone(dt.previous_fn)
+        self.assertLess(dt.curtime_to_int(), days * 86400)
+        self.assertEqual(dt.search.search('a')[0], 2)
+        dt.turn_on(1)
+        self.assertEqual(dt.search.search('')[:2], [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
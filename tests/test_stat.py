@@ -0,0 +1,52 @@
+import cPickle
+import unittest
+from common import DataTestCase
+import tacmaopt
+
+
+class LastSessionTest(DataTestCase):
+    def test_quantized_cache_and_just_started_session(self):
+        fn = self.write_data([('a', [100, 200], [0, 1]),
+                              ('b', [300, 400], [0, 1])])
+        tacmaopt.opt.stat_cache_quantum = 10 ** 6
+        dt = self.load(fn)
+        dt.turn_on(0)
+        self.assertEqual(dt.stat.last_session(0), 0)
+        self.assertIsNone(dt.stat.last_session(1))
+        dt.turn_off()
+        self.assertEqual(dt.stat.last_session(0), dt._gai(0).onoff[-1] -
+                         dt._gai(0).onoff[-2])
+
+
+class SnapshotTest(DataTestCase):
+    def saved_hash(self):
+        '->file hash saved with statistics snapshot'
+        with open(tacmaopt.opt.stat_snapshot_fn, 'rb') as f:
+            return cPickle.load(f)[1]
+
+    def test_save(self):
+        fn = self.write_data([('a', [100, 200], [0, 1]),
+                              ('b', [300, 400], [0, 1])])
+        dt = self.load(fn)
+        dt.write_data()
+        self.assertEqual(self.saved_hash(), dt.file_hash)
+        # unchanged statistics are not pickled again
+        body = dt.stat._snap._body
+        dt.write_data()
+        self.assertIs(dt.stat._snap._body, body)
+        self.assertEqual(self.saved_hash(), dt.file_hash)
+        # statistics of modified data are not built until events
+        # delivery, previous ones are not saved
+        dt.emitter.defer = lambda f: None
+        dt.change_action_prior(0, 5)
+        self.assertNotEqual(self.saved_hash(), dt.file_hash)
+        dt.emitter.flush()
+        dt.write_data()
+        self.assertEqual(self.saved_hash(), dt.file_hash)
+        d2 = self.load(fn)
+        self.assertEqual(d2.stat.must_time(0, 86400, 1000),
+                         dt.stat.must_time(0, 86400, 1000))
+
+
+if __name__ == '__main__':
+    unittest.main()